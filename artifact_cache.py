@@ -0,0 +1,205 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from columnar_cache import CACHE_ROOT
+
+# Giới hạn bộ nhớ (MB) và thời gian sống (giây) của cache, chỉnh qua biến môi trường
+DATA_CACHE_MB = int(os.environ.get('SUPERSTORE_DATA_CACHE_MB', '2048'))
+AGGREGATE_CACHE_MB = int(os.environ.get('SUPERSTORE_AGGREGATE_CACHE_MB', '256'))
+CACHE_TTL = float(os.environ.get('SUPERSTORE_CACHE_TTL', '0')) or None
+SPILL_DIR = CACHE_ROOT / 'spill'
+SPILL_MB = int(os.environ.get('SUPERSTORE_SPILL_MB', '1024'))
+
+
+def estimate_size(value):
+    # Ước lượng số byte của một kết quả được cache (DataFrame, mảng, tuple/dict lồng nhau...)
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(estimate_size(item) for item in value.values())
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class ArtifactCache:
+    # Cache LRU giới hạn theo tổng số byte, tuỳ chọn TTL; mục bị đẩy ra có thể được ghi xuống đĩa (spill)
+    # và nạp lại khi cần thay vì tính lại. Dùng chung giữa các phiên nên mọi thao tác đều giữ khóa.
+    # Tầng đĩa chỉ sống trong một tiến trình: file của lần chạy trước (có thể từ mã cũ) bị xoá khi khởi tạo,
+    # tổng dung lượng bị giới hạn bởi max_spill_bytes (xoá file spill cũ nhất trước)
+    def __init__(self, name, max_bytes, ttl=None, spill_dir=None, max_spill_bytes=None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.spilled = OrderedDict()
+        self.spill_bytes = 0
+        self.counters = {'hits': 0, 'spill_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'spills': 0}
+        self._lock = threading.RLock()
+        self._clear_spill()
+
+    def _spill_path(self, key):
+        return self.spill_dir / f'{self.name}-{key}.pkl'
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remove(self, key):
+        value, nbytes, created = self.entries.pop(key)
+        self.total_bytes -= nbytes
+        return value, created
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self.entries:
+                value, nbytes, created = self.entries[key]
+                if not self._expired(created):
+                    self.entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return value
+                self._remove(key)
+                self.counters['expirations'] += 1
+
+            # Tầng đĩa: nạp lại mục đã bị đẩy ra khỏi bộ nhớ
+            if key in self.spilled:
+                path = self._spill_path(key)
+                with open(path, 'rb') as f:
+                    value, created = pickle.load(f)
+                self._unspill(key)
+                if not self._expired(created):
+                    self.counters['spill_hits'] += 1
+                    self._insert(key, value, created)
+                    return value
+                self.counters['expirations'] += 1
+
+            self.counters['misses'] += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            if key in self.entries:
+                self._remove(key)
+            if key in self.spilled:
+                self._unspill(key)
+            self._insert(key, value, time.time())
+
+    def _insert(self, key, value, created):
+        nbytes = estimate_size(value)
+        if nbytes > self.max_bytes:
+            # Lớn hơn cả ngân sách: trả về cho phiên hiện tại nhưng không giữ lại
+            return
+        self.entries[key] = (value, nbytes, created)
+        self.total_bytes += nbytes
+        while self.total_bytes > self.max_bytes:
+            old_key = next(iter(self.entries))
+            old_value, old_created = self._remove(old_key)
+            self.counters['evictions'] += 1
+            if self.spill_dir is not None:
+                self._spill(old_key, old_value, old_created)
+
+    def _spill(self, key, value, created):
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self._spill_path(key)
+        tmp_path = path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((value, created), f, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            tmp_path.unlink(missing_ok=True)
+            return
+        os.replace(tmp_path, path)
+        self.counters['spills'] += 1
+        self.spilled[key] = path.stat().st_size
+        self.spill_bytes += self.spilled[key]
+        while self.max_spill_bytes is not None and self.spill_bytes > self.max_spill_bytes:
+            self._unspill(next(iter(self.spilled)))
+
+    def _unspill(self, key):
+        self.spill_bytes -= self.spilled.pop(key)
+        self._spill_path(key).unlink(missing_ok=True)
+
+    def _clear_spill(self):
+        self.spilled.clear()
+        self.spill_bytes = 0
+        if self.spill_dir is not None and self.spill_dir.exists():
+            for path in self.spill_dir.glob(f'{self.name}-*'):
+                path.unlink(missing_ok=True)
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+            self._clear_spill()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['spill_hits'] + self.counters['misses']
+            return {
+                'cache': self.name,
+                **self.counters,
+                'hit_rate': (self.counters['hits'] + self.counters['spill_hits']) / lookups if lookups else None,
+                'entries': len(self.entries),
+                'mb': round(self.total_bytes / 2 ** 20, 1),
+                'max_mb': round(self.max_bytes / 2 ** 20, 1),
+                'spill_mb': round(self.spill_bytes / 2 ** 20, 1),
+            }
+
+
+# Dữ liệu đã tải/làm sạch: đã có bản trên đĩa (Parquet, kho Arrow) nên không cần spill;
+# kết quả tổng hợp nhỏ và tốn công tính nên được ghi xuống đĩa khi bị đẩy ra
+DATA_CACHE = ArtifactCache('data', DATA_CACHE_MB * 2 ** 20, CACHE_TTL)
+AGGREGATE_CACHE = ArtifactCache('aggregate', AGGREGATE_CACHE_MB * 2 ** 20, CACHE_TTL, SPILL_DIR, SPILL_MB * 2 ** 20)
+CACHES = [DATA_CACHE, AGGREGATE_CACHE]
+
+
+def cache_key(name, args, kwargs):
+    # Giống st.cache_data: tham số bắt đầu bằng '_' không tham gia vào khóa
+    payload = json.dumps([name, args, kwargs], sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def cached(cache, spinner=None):
+    def decorator(func):
+        names = func.__code__.co_varnames[:func.__code__.co_argcount]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key_args = [arg for name, arg in zip(names, args) if not name.startswith('_')]
+            key_kwargs = {name: arg for name, arg in kwargs.items() if not name.startswith('_')}
+            key = cache_key(func.__qualname__, key_args, key_kwargs)
+            missing = object()
+            value = cache.get(key, missing)
+            if value is missing:
+                if spinner:
+                    with st.spinner(spinner):
+                        value = func(*args, **kwargs)
+                else:
+                    value = func(*args, **kwargs)
+                cache.put(key, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    return pd.DataFrame([cache.stats() for cache in CACHES])
@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+from columnar_cache import file_fingerprint, load_columnar
+from dedup import load_row_hashes
+from outliers import OUTLIER_METHODS
+from pipeline import DEFAULT_OPTIONS, clean_data
+from schema import optimize_dtypes
+
+
+def process_country(country, df_country, options, output_dir, row_hashes=None):
+    # Chạy trong tiến trình con: chỉ nhận phần dữ liệu của một quốc gia (kèm băm dòng tương ứng)
+    start = time.perf_counter()
+    df_cleaned, info = clean_data(df_country, country, options, row_hashes=row_hashes)
+    output_path = Path(output_dir) / f'Updated_{country}_data.csv'
+    df_cleaned.to_csv(output_path, index=False)
+    return {
+        'country': country,
+        'output': str(output_path),
+        'rows_in': len(df_country),
+        'rows_out': len(df_cleaned),
+        'nat_order_date': info['nat_order_date'],
+        'nat_ship_date': info['nat_ship_date'],
+        'average_delivery_time': float(info['average_delivery_time']) if pd.notna(info['average_delivery_time'])
+        else None,
+        'outlier_counts': info['outlier_counts'],
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def run_batch(path, output_dir='.', countries=None, options=None, workers=None):
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    # Đọc và phân tích file một lần (qua cache Parquet), sau đó chia theo quốc gia trong một lượt groupby;
+    # chỉ mục băm dòng được lưu cạnh cache nên lần chạy sau không phải băm lại
+    fingerprint = file_fingerprint(path)
+    df = optimize_dtypes(load_columnar(path, fingerprint))
+    hashes = load_row_hashes(fingerprint, df, options['dedup_keys']) if options['drop_duplicates'] else None
+    groups = {country: (df.take(idx), hashes[idx] if hashes is not None else None)
+              for country, idx in df.groupby('Country', observed=True, sort=True).indices.items()}
+    if countries:
+        groups = {country: groups[country] for country in countries if country in groups}
+    load_seconds = time.perf_counter() - start
+
+    results, errors = [], {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_country, country, group, options, output_dir, group_hashes): country
+                   for country, (group, group_hashes) in groups.items()}
+        for future in as_completed(futures):
+            country = futures[future]
+            try:
+                result = future.result()
+            except Exception as exc:
+                errors[country] = repr(exc)
+                print(f'[LỖI] {country}: {exc!r}')
+                continue
+            results.append(result)
+            print(f"[OK] {country}: {result['rows_out']} dòng -> {result['output']} ({result['seconds']}s)")
+
+    summary = {
+        'input': str(path),
+        'options': options,
+        'workers': workers or os.cpu_count(),
+        'countries': len(groups),
+        'load_seconds': round(load_seconds, 3),
+        'total_seconds': round(time.perf_counter() - start, 3),
+        'results': sorted(results, key=lambda r: r['country']),
+        'errors': errors,
+    }
+    with open(output_dir / 'run_summary.json', 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Xử lý dữ liệu cho tất cả các quốc gia và ghi ra Updated_{country}_data.csv")
+    parser.add_argument('path', help="File dữ liệu .csv hoặc .xlsx")
+    parser.add_argument('-o', '--output-dir', default='.', help="Thư mục ghi kết quả (mặc định: thư mục hiện tại)")
+    parser.add_argument('-c', '--country', action='append', dest='countries',
+                        help="Chỉ xử lý quốc gia này (có thể lặp lại nhiều lần)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Số tiến trình (mặc định: số nhân CPU)")
+    parser.add_argument('--outlier-method', choices=list(OUTLIER_METHODS), default=DEFAULT_OPTIONS['outlier_method'])
+    args = parser.parse_args(argv)
+
+    summary = run_batch(args.path, args.output_dir, args.countries, {'outlier_method': args.outlier_method},
+                        args.workers)
+    print(f"Đã xử lý {len(summary['results'])}/{summary['countries']} quốc gia trong {summary['total_seconds']}s, "
+          f"tóm tắt: {Path(args.output_dir) / 'run_summary.json'}")
+    return 1 if summary['errors'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
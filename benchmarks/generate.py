@@ -0,0 +1,150 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from postal_index import FIRST_POSTAL_CODE
+
+# Các cột giống hệt Updated_Germany_data.csv
+COLUMNS = ['Row ID', 'Order ID', 'Order Date', 'Ship Date', 'Ship Mode', 'Customer ID', 'Customer Name', 'Segment',
+           'City', 'State', 'Country', 'Postal Code', 'Market', 'Region', 'Product ID', 'Category', 'Sub-Category',
+           'Product Name', 'Sales', 'Quantity', 'Discount', 'Profit', 'Shipping Cost', 'Order Priority',
+           'Delivery Time']
+
+SHIP_MODES = {'Standard Class': 0.6, 'Second Class': 0.2, 'First Class': 0.15, 'Same Day': 0.05}
+SHIP_DAYS = {'Standard Class': (4, 7), 'Second Class': (2, 5), 'First Class': (1, 3), 'Same Day': (0, 1)}
+SEGMENTS = {'Consumer': 0.52, 'Corporate': 0.3, 'Home Office': 0.18}
+PRIORITIES = {'Medium': 0.57, 'High': 0.3, 'Critical': 0.08, 'Low': 0.05}
+SUB_CATEGORIES = {
+    'Accessories': 'Technology', 'Copiers': 'Technology', 'Machines': 'Technology', 'Phones': 'Technology',
+    'Appliances': 'Office Supplies', 'Art': 'Office Supplies', 'Binders': 'Office Supplies',
+    'Envelopes': 'Office Supplies', 'Fasteners': 'Office Supplies', 'Labels': 'Office Supplies',
+    'Paper': 'Office Supplies', 'Storage': 'Office Supplies', 'Supplies': 'Office Supplies',
+    'Bookcases': 'Furniture', 'Chairs': 'Furniture', 'Furnishings': 'Furniture', 'Tables': 'Furniture',
+}
+CATEGORY_PREFIX = {'Technology': 'TEC', 'Office Supplies': 'OFF', 'Furniture': 'FUR'}
+MARKETS = [('EU', 'Central'), ('EU', 'North'), ('EU', 'South'), ('US', 'East'), ('US', 'West'), ('APAC', 'Oceania'),
+           ('APAC', 'Southeast Asia'), ('LATAM', 'South'), ('Africa', 'Africa'), ('EMEA', 'EMEA'), ('Canada', 'Canada')]
+DISCOUNTS = [0.0, 0.0, 0.0, 0.1, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5]
+
+# Độ lớn thực tế của Global Superstore (51,290 dòng): 147 quốc gia, ~3,600 thành phố,
+# ~1,600 khách hàng, ~10,000 sản phẩm
+N_COUNTRIES = 147
+CITIES_PER_COUNTRY = 25
+ORDER_DATE_RANGE = ('2011-01-01', '2014-12-31')
+
+
+def _choice(rng, weights, size):
+    keys = list(weights)
+    probs = np.array(list(weights.values()), dtype=float)
+    return np.array(keys, dtype=object)[rng.choice(len(keys), size=size, p=probs / probs.sum())]
+
+
+def _zipf_weights(n, s=1.1):
+    weights = 1 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+
+def _geography(rng):
+    # Germany dùng danh sách thành phố thật trong bảng mã bưu chính, các quốc gia khác dùng tên giả lập
+    rows = [('Germany', city, f'State {i % 16}', 'EU', 'Central') for i, city in enumerate(FIRST_POSTAL_CODE)]
+    for c in range(1, N_COUNTRIES):
+        market, region = MARKETS[c % len(MARKETS)]
+        n_cities = int(rng.integers(CITIES_PER_COUNTRY // 2, CITIES_PER_COUNTRY * 2))
+        rows.extend((f'Country {c:03d}', f'City {c:03d}-{i:03d}', f'State {c:03d}-{i % 8}', market, region)
+                    for i in range(n_cities))
+    return pd.DataFrame(rows, columns=['Country', 'City', 'State', 'Market', 'Region'])
+
+
+def generate_superstore(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    n_customers = max(50, min(rows // 32, 200_000))
+    n_products = max(100, min(rows // 5, 500_000))
+    n_orders = max(1, rows // 2)
+
+    # Thành phố: quốc gia phân bố lệch (Zipf), thành phố đều trong mỗi quốc gia
+    geo = _geography(rng)
+    countries = geo['Country'].unique()
+    country_weights = _zipf_weights(len(countries))
+    city_weights = country_weights[pd.factorize(geo['Country'])[0]] / geo.groupby('Country')['City'].transform('size')
+    city_idx = rng.choice(len(geo), size=rows, p=(city_weights / city_weights.sum()).to_numpy())
+    location = geo.iloc[city_idx].reset_index(drop=True)
+
+    # Đơn hàng: mỗi đơn trung bình 2 dòng, ngày đặt và chế độ vận chuyển theo đơn
+    order_idx = np.sort(rng.integers(0, n_orders, size=rows))
+    start, end = (np.datetime64(d) for d in ORDER_DATE_RANGE)
+    order_dates = start + rng.integers(0, int((end - start).astype(int)) + 1, size=n_orders).astype('timedelta64[D]')
+    ship_mode_by_order = _choice(rng, SHIP_MODES, n_orders)
+    low = np.array([SHIP_DAYS[m][0] for m in ship_mode_by_order])
+    high = np.array([SHIP_DAYS[m][1] for m in ship_mode_by_order])
+    ship_dates = order_dates + rng.integers(low, high + 1).astype('timedelta64[D]')
+    order_years = order_dates.astype('datetime64[Y]').astype(int) + 1970
+    order_ids = np.char.add(np.char.add('ES-', order_years.astype(str)),
+                            np.char.add('-', (1_000_000 + np.arange(n_orders)).astype(str)))
+
+    customer_idx = rng.integers(0, n_customers, size=rows)
+    customer_segment = _choice(rng, SEGMENTS, n_customers)
+    product_idx = rng.integers(0, n_products, size=rows)
+    product_sub = np.array(list(SUB_CATEGORIES), dtype=object)[rng.integers(0, len(SUB_CATEGORIES), size=n_products)]
+    product_cat = np.array([SUB_CATEGORIES[s] for s in product_sub], dtype=object)
+    product_ids = np.array([f'{CATEGORY_PREFIX[c]}-{s[:2].upper()}-{10000000 + i}'
+                            for i, (c, s) in enumerate(zip(product_cat, product_sub))], dtype=object)
+
+    sales = np.round(rng.lognormal(mean=4.5, sigma=1.2, size=rows), 2)
+    quantity = rng.integers(1, 15, size=rows)
+    discount = np.array(DISCOUNTS)[rng.integers(0, len(DISCOUNTS), size=rows)]
+    profit = np.round(sales * rng.normal(0.12 - discount / 2, 0.25), 2)
+    shipping_cost = np.round(sales * rng.uniform(0.02, 0.2, size=rows), 2)
+
+    df = pd.DataFrame({
+        'Row ID': np.arange(1, rows + 1),
+        'Order ID': order_ids[order_idx],
+        'Order Date': pd.to_datetime(order_dates[order_idx]).strftime('%Y-%m-%d'),
+        'Ship Date': pd.to_datetime(ship_dates[order_idx]).strftime('%Y-%m-%d'),
+        'Ship Mode': ship_mode_by_order[order_idx],
+        'Customer ID': np.char.add('CU-', (10000 + customer_idx).astype(str)),
+        'Customer Name': np.char.add('Customer ', customer_idx.astype(str)),
+        'Segment': customer_segment[customer_idx],
+        'City': location['City'].to_numpy(),
+        'State': location['State'].to_numpy(),
+        'Country': location['Country'].to_numpy(),
+        'Postal Code': location['City'].map(FIRST_POSTAL_CODE).to_numpy(),
+        'Market': location['Market'].to_numpy(),
+        'Region': location['Region'].to_numpy(),
+        'Product ID': product_ids[product_idx],
+        'Category': product_cat[product_idx],
+        'Sub-Category': product_sub[product_idx],
+        'Product Name': np.char.add(product_sub[product_idx].astype(str), np.char.add(' ', product_ids[product_idx].astype(str))),
+        'Sales': sales,
+        'Quantity': quantity,
+        'Discount': discount,
+        'Profit': profit,
+        'Shipping Cost': shipping_cost,
+        'Order Priority': _choice(rng, PRIORITIES, n_orders)[order_idx],
+    })
+    df['Delivery Time'] = (ship_dates - order_dates)[order_idx].astype(int)
+    # Xáo trộn thứ tự dòng giống file xuất thật
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)[COLUMNS]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinh dữ liệu Global Superstore giả lập cùng schema")
+    parser.add_argument('rows', type=int, help="Số dòng")
+    parser.add_argument('-o', '--output', default=None, help="File .csv/.xlsx/.parquet (mặc định: superstore_<rows>.csv)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    output = Path(args.output or f'superstore_{args.rows}.csv')
+    df = generate_superstore(args.rows, args.seed)
+    if output.suffix == '.xlsx':
+        df.to_excel(output, index=False)
+    elif output.suffix == '.parquet':
+        df.to_parquet(output, index=False)
+    else:
+        df.to_csv(output, index=False)
+    print(f"Đã ghi {len(df):,} dòng vào {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly
+
+# Đường dẫn cache của ứng dụng (columnar, kho Arrow, registry, chỉ mục băm...) được tính lúc import:
+# trỏ SUPERSTORE_CACHE_DIR vào thư mục tạm của lần đo trước khi import các module để không đụng tới .cache thật
+WORKDIR = tempfile.TemporaryDirectory(prefix='superstore-bench-')
+os.environ['SUPERSTORE_CACHE_DIR'] = WORKDIR.name
+
+import columnar_cache
+import dataset_store
+from benchmarks.generate import generate_superstore
+from cube import build_cube
+from dates import parse_dates
+from forecast import batch_forecast
+from ingest import iter_chunks, read_options
+from outliers import handle_outliers
+from pipeline import DEFAULT_OPTIONS, clean_all, clean_data, update_postal_codes
+from query import QUERY_BACKENDS, query_cube
+from schema import optimize_dtypes
+from stream_outliers import sketch_chunks, stream_bounds
+from timeseries import GRANULARITIES, build_daily, series
+from views import analysis_figures, comparison_tables, overview_tables, trend_figure, visualization_figures
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+DEFAULT_SIZES = [10_000, 100_000]
+# Chênh lệch lớn hơn ngưỡng này so với lần chạy trước được đánh dấu là hồi quy
+REGRESSION_THRESHOLD = 1.2
+
+
+def measure(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def bench_size(rows, repeat, workdir):
+    results = []
+
+    def record(name, fn, n=repeat):
+        times = measure(fn, n)
+        results.append({'rows': rows, 'benchmark': name, 'repeat': n,
+                        'min_s': min(times), 'median_s': statistics.median(times)})
+        print(f"  {name:<32} {min(times):>9.4f}s")
+
+    df_raw = generate_superstore(rows)
+    csv_path = Path(workdir) / f'superstore_{rows}.csv'
+    df_raw.to_csv(csv_path, index=False)
+    country = df_raw['Country'].value_counts().index[0]
+
+    # Đọc dữ liệu
+    record('load/read_csv', lambda: columnar_cache.read_source(csv_path))
+    # Chỉ các cột trong schema, kiểu khai báo sẵn và ngày phân tích khi đọc
+    record('load/read_csv_schema',
+           lambda: pd.concat(list(iter_chunks(str(csv_path), **read_options(str(csv_path)))), ignore_index=True))
+    fingerprint = columnar_cache.file_fingerprint(csv_path)
+
+    def cold_load():
+        columnar_cache.cache_path(fingerprint).unlink(missing_ok=True)
+        columnar_cache.load_columnar(csv_path, fingerprint)
+
+    record('load/columnar_cold', cold_load)
+    record('load/columnar_warm', lambda: columnar_cache.load_columnar(csv_path, fingerprint))
+    df = columnar_cache.load_columnar(csv_path, fingerprint)
+    record('load/optimize_dtypes', lambda: optimize_dtypes(df.copy()))
+
+    # Đường đọc thật của dashboard: lần đầu đọc file theo schema, ghi cache Parquet và kho Arrow;
+    # các lần sau chỉ memory-map file Arrow trong kho
+    def shared_cold():
+        columnar_cache.cache_path(columnar_cache.schema_cache_key(fingerprint)).unlink(missing_ok=True)
+        dataset_store.store_path(fingerprint).unlink(missing_ok=True)
+        dataset_store.load_shared(fingerprint, str(csv_path))
+
+    record('load/shared_cold', shared_cold)
+    record('load/shared_warm', lambda: dataset_store.load_shared(fingerprint, str(csv_path)))
+    df = dataset_store.load_shared(fingerprint, str(csv_path))
+
+    # Chuỗi làm sạch và từng bước con trên dữ liệu của quốc gia lớn nhất
+    record('clean/clean_data', lambda: clean_data(df, country, DEFAULT_OPTIONS))
+    df_country = df[df['Country'] == country]
+    record('clean/parse_dates', lambda: parse_dates(df_country.copy()))
+    df_dated, _, _ = parse_dates(df_country.copy())
+    record('clean/handle_outliers', lambda: handle_outliers(df_dated.copy(), DEFAULT_OPTIONS['numeric_cols']))
+    # Biên ngoại lai xấp xỉ từ sketch dựng theo từng chunk (chế độ dữ liệu không vừa bộ nhớ)
+    numeric_cols = DEFAULT_OPTIONS['numeric_cols']
+    chunks = lambda: (df_dated.iloc[i:i + 10_000] for i in range(0, len(df_dated), 10_000))
+    record('clean/sketch_outlier_bounds', lambda: stream_bounds(sketch_chunks(chunks(), numeric_cols), numeric_cols))
+    record('clean/update_postal_codes', lambda: update_postal_codes(df_dated.copy()))
+
+    # Tổng hợp của từng tab và dựng biểu đồ (gọi thẳng hàm gốc, bỏ qua st.cache_data)
+    df_cleaned, _ = clean_data(df, country, DEFAULT_OPTIONS)
+    record('tabs/build_cube', lambda: build_cube(df_cleaned))
+    cube = build_cube(df_cleaned)
+    # Cube tính bằng các bộ máy truy vấn đã cài, trên file Arrow của kho (memory-map) và trên file Parquet
+    # (lọc khi đọc); DataFrame trong bộ nhớ luôn dùng pandas (tabs/build_cube)
+    cleaned_path = Path(workdir) / f'cleaned_{rows}.parquet'
+    df_cleaned.to_parquet(cleaned_path, index=False)
+    dataset_store.write_frame(f'cleaned_{rows}', df_cleaned)
+    arrow_path = dataset_store.store_path(f'cleaned_{rows}')
+    for backend in QUERY_BACKENDS:
+        record(f'query/{backend}_arrow', lambda: query_cube([arrow_path], backend))
+        record(f'query/{backend}_parquet', lambda: query_cube([str(cleaned_path)], backend, country))
+    # So sánh quốc gia: làm sạch mọi quốc gia trong một lượt và tính chỉ số từ cube toàn bộ dữ liệu
+    record('compare/clean_all', lambda: clean_all(df, DEFAULT_OPTIONS))
+    df_all = clean_all(df, DEFAULT_OPTIONS)
+    record('compare/comparison_tables', lambda: comparison_tables(df_all, build_cube(df_all, ('Country',))))
+    record('tabs/overview_tables', lambda: overview_tables(df_cleaned, cube))
+    record('tabs/visualization_figures',
+           lambda: visualization_figures.__wrapped__(None, country, False, cube))
+    record('tabs/visualization_figures_large',
+           lambda: visualization_figures.__wrapped__(None, country, True, cube))
+    record('tabs/analysis_figures', lambda: analysis_figures.__wrapped__(None, country, cube))
+    # Chuỗi thời gian: bảng theo ngày dựng một lần, mỗi lần đổi độ chi tiết chỉ cộng dồn từ bảng này
+    record('trend/build_daily', lambda: build_daily(df_cleaned))
+    daily = build_daily(df_cleaned)
+    for granularity in GRANULARITIES:
+        record(f'trend/series_{granularity}', lambda: series(daily, granularity))
+    record('trend/figure', lambda: trend_figure.__wrapped__(None, 'ME', ('Sales', 'Profit'), 3, False, False, daily))
+    # Dự báo: mọi chuỗi được khớp cùng lúc bằng một lần bình phương tối thiểu
+    # (độ chi tiết Danh mục con × Thành phố × Tháng không nằm trong cube, được tổng hợp khi cần như trên dashboard)
+    city_grain = [('Sub-Category', 'City', 'Month')]
+    record('forecast/subcategory_city',
+           lambda: batch_forecast(build_cube(df_cleaned, grains=city_grain), ['Sub-Category', 'City']))
+    record('forecast/all_countries_subcategory_city',
+           lambda: batch_forecast(build_cube(df_all, grains=city_grain), ['Sub-Category', 'City']))
+    figures = (visualization_figures.__wrapped__(None, country, False, cube)
+               + analysis_figures.__wrapped__(None, country, cube))
+    record('tabs/figures_to_json', lambda: [fig.to_json() for fig in figures])
+    return results
+
+
+def environment():
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plotly': plotly.__version__,
+    }
+
+
+def compare(current, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+    previous = {(r['rows'], r['benchmark']): r['min_s'] for r in baseline['results']}
+    regressions = 0
+    print(f"\nSo sánh với {baseline_path}:")
+    for r in current['results']:
+        old = previous.get((r['rows'], r['benchmark']))
+        if not old:
+            continue
+        ratio = r['min_s'] / old
+        flag = ' <-- chậm hơn' if ratio > REGRESSION_THRESHOLD else ''
+        regressions += bool(flag)
+        print(f"  {r['rows']:>10,} {r['benchmark']:<32} {old:>9.4f}s -> {r['min_s']:>9.4f}s  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo thời gian các bước của dashboard trên dữ liệu giả lập")
+    parser.add_argument('--rows', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="Danh sách số dòng, cách nhau bởi dấu phẩy (ví dụ 10000,100000,1000000)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('-o', '--output', default=None, help="File JSON kết quả (mặc định: benchmarks/results/)")
+    parser.add_argument('--compare', default=None, help="File JSON của lần chạy trước để so sánh")
+    args = parser.parse_args(argv)
+
+    current = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'environment': environment(),
+               'results': []}
+    with WORKDIR as workdir:
+        for rows in (int(r) for r in args.rows.split(',')):
+            print(f"{rows:,} dòng")
+            current['results'].extend(bench_size(rows, args.repeat, workdir))
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(current, indent=2), encoding='utf-8')
+    print(f"Đã lưu kết quả vào {output}")
+
+    if args.compare:
+        return 1 if compare(current, args.compare) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
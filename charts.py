@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+LARGE_DATA_ROWS = 100_000
+TOP_N = 20
+MAX_POINTS_PER_TRACE = 2000
+OTHERS_LABEL = 'Khác'
+
+
+def top_n_with_others(frame, n=TOP_N, sort_by='Sales', other_label=OTHERS_LABEL):
+    # Giữ n nhóm lớn nhất theo sort_by, gộp phần còn lại thành một cột "Khác"
+    frame = frame.sort_values(by=sort_by, ascending=False)
+    if len(frame) <= n:
+        return frame
+    top = frame.iloc[:n]
+    others = frame.iloc[n:].sum(numeric_only=True).to_frame(other_label).T
+    result = pd.concat([top, others])
+    result.index.name = frame.index.name
+    return result
+
+
+def downsample(frame, max_points=MAX_POINTS_PER_TRACE):
+    # Giảm số điểm bằng cách giữ điểm nhỏ nhất và lớn nhất của mỗi nhóm điểm liên tiếp,
+    # nên các đỉnh và đáy của đường vẫn được giữ lại
+    if len(frame) <= max_points:
+        return frame
+    columns = frame.select_dtypes(include='number').columns
+    n_buckets = max(max_points // (2 * max(len(columns), 1)), 1)
+    buckets = np.arange(len(frame)) * n_buckets // len(frame)
+    positions = np.arange(len(frame))
+    keep = set()
+    for col in columns:
+        values = pd.Series(frame[col].to_numpy(), index=positions)
+        grouped = values.groupby(buckets)
+        keep.update(grouped.idxmin().dropna().astype(int))
+        keep.update(grouped.idxmax().dropna().astype(int))
+    return frame.iloc[sorted(keep)]
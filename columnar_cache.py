@@ -0,0 +1,84 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+CACHE_ROOT = Path(os.environ.get('SUPERSTORE_CACHE_DIR', '.cache'))
+CACHE_DIR = CACHE_ROOT / 'columnar'
+
+
+def file_fingerprint(file, block_size=1 << 20):
+    # Băm nội dung theo từng khối để không phải nạp cả file lớn vào bộ nhớ
+    digest = hashlib.sha256()
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+    else:
+        digest.update(file.getvalue())
+    return digest.hexdigest()
+
+
+def cache_path(fingerprint):
+    return CACHE_DIR / f'{fingerprint}.parquet'
+
+
+def schema_cache_key(fingerprint):
+    # Cache chỉ gồm các cột theo schema của dashboard, tách khỏi cache đầy đủ dùng cho batch.py, postal.py
+    return f'{fingerprint}-schema'
+
+
+def replace_atomic(path, write):
+    # Ghi qua file tạm có tên riêng trong cùng thư mục rồi đổi tên: nhiều phiên (hoặc job nền) ghi cùng một
+    # khóa không giẫm lên file tạm của nhau, người đọc chỉ thấy file cũ hoặc file mới hoàn chỉnh
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'{path.name}.', suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def read_source(file):
+    name = getattr(file, 'name', str(file))
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    if name.endswith('.csv'):
+        return pd.read_csv(file)
+    elif name.endswith('.xlsx'):
+        return pd.read_excel(file)
+    raise ValueError(f"Định dạng file không được hỗ trợ: {name}")
+
+
+def read_cached(fingerprint, columns=None, filters=None):
+    path = cache_path(fingerprint)
+    if not path.exists():
+        return None
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def write_cache(fingerprint, df):
+    try:
+        replace_atomic(cache_path(fingerprint), lambda tmp_path: df.to_parquet(tmp_path, index=False))
+    except (pa.ArrowException, ValueError):
+        # Cột object có kiểu trộn lẫn không ghi được sang Parquet, bỏ qua cache
+        return False
+    return True
+
+
+def load_columnar(file, fingerprint=None):
+    # Lần đầu đọc CSV/XLSX và ghi lại dạng Parquet, các lần sau đọc thẳng từ cache
+    if fingerprint is None:
+        fingerprint = file_fingerprint(file)
+    df = read_cached(fingerprint)
+    if df is None:
+        df = read_source(file)
+        write_cache(fingerprint, df)
+    return df
@@ -0,0 +1,146 @@
+import pandas as pd
+
+CUBE_MEASURES = ['Sales', 'Profit', 'Quantity', 'Shipping Cost']
+# Các độ chi tiết mà các phần hiển thị cần tới, mỗi độ chi tiết là một bảng tổng hợp nhỏ
+# (Category lấy từ Category x Segment, tổng toàn bộ là độ chi tiết rỗng)
+CUBE_GRAINS = [
+    (),
+    ('Segment',),
+    ('Ship Mode',),
+    ('Order Priority',),
+    ('Sub-Category',),
+    ('City',),
+    ('Category', 'Segment'),
+    ('Month',),
+    ('Segment', 'Month'),
+    ('Sub-Category', 'Month'),
+]
+
+
+def measure_names():
+    names = []
+    for col in CUBE_MEASURES:
+        names += [f'{col}_sum', f'{col}_count']
+    return names + ['Order ID_count']
+
+
+def cube_grains(by=(), grains=CUBE_GRAINS):
+    # by: các cột thêm vào đầu mọi độ chi tiết, ví dụ ('Country',) cho cube của nhiều quốc gia
+    return list(dict.fromkeys((*by, *grain) for grain in grains))
+
+
+def month_start(dates):
+    return dates.dt.to_period('M').dt.to_timestamp()
+
+
+def covering_table(cube, grain):
+    # Bảng nhỏ nhất có chứa mọi cột của 'grain', None nếu cube không có độ chi tiết đó
+    candidates = [table for key, table in cube.items() if set(grain) <= set(key)]
+    return min(candidates, key=len, default=None)
+
+
+def cube_size(cube):
+    return sum(len(table) for table in cube.values())
+
+
+def _aggregate_rows(frame, grain):
+    measures = {}
+    for col in CUBE_MEASURES:
+        measures[f'{col}_sum'] = (col, 'sum')
+        measures[f'{col}_count'] = (col, 'count')
+    measures['Order ID_count'] = ('Order ID', 'count')
+    if not grain:
+        return pd.DataFrame([{name: getattr(frame[col], func)() for name, (col, func) in measures.items()}])
+    return frame.groupby(list(grain), dropna=False, observed=True, sort=False).agg(**measures).reset_index()
+
+
+def _aggregate_table(table, grain):
+    if not grain:
+        return table[measure_names()].sum().to_frame().T.astype(table[measure_names()].dtypes)
+    return table.groupby(list(grain), dropna=False, observed=True, sort=False)[measure_names()].sum().reset_index()
+
+
+def build_cube(df, by=(), grains=CUBE_GRAINS):
+    # Dựng các bảng tổng hợp nhỏ cho từng độ chi tiết. Độ chi tiết thô hơn được cộng dồn từ bảng nhỏ nhất đã có
+    # chứa nó; mỗi độ chi tiết không suy ra được tốn một lượt groupby trên dữ liệu gốc (với CUBE_GRAINS là 6 lượt:
+    # Category×Segment, Segment×Month, Sub-Category×Month, Ship Mode, Order Priority, City). Không gộp thành một
+    # bảng ở độ chi tiết mịn nhất vì tích chéo mọi chiều (City × Month × ...) gần bằng số dòng gốc
+    frame = df.assign(Month=month_start(df['Order Date']))
+    cube = {}
+    for grain in sorted(cube_grains(by, grains), key=len, reverse=True):
+        if not set(grain) <= set(frame.columns):
+            continue
+        source = covering_table(cube, grain)
+        cube[grain] = _aggregate_rows(frame, grain) if source is None else _aggregate_table(source, grain)
+    return cube
+
+
+def rollup(cube, by, **named):
+    # Cộng dồn bảng nhỏ nhất chứa các cột 'by', cú pháp giống groupby().agg(ten=(cot, ham))
+    # Hàm hỗ trợ: 'sum', 'count', 'mean' (mean = tổng / số giá trị khác NaN)
+    needed = set()
+    for col, func in named.values():
+        if func in ('sum', 'mean'):
+            needed.add(f'{col}_sum')
+        if func in ('count', 'mean'):
+            needed.add(f'{col}_count')
+    grain = [by] if isinstance(by, str) else list(by)
+    table = covering_table(cube, grain)
+    if table is None:
+        raise KeyError(f"Cube không có độ chi tiết chứa {grain}")
+    if grain:
+        totals = table.groupby(by, observed=True)[sorted(needed)].sum()
+    else:
+        totals = table[sorted(needed)].sum().to_frame().T
+
+    result = {}
+    for name, (col, func) in named.items():
+        if func == 'sum':
+            result[name] = totals[f'{col}_sum']
+        elif func == 'count':
+            result[name] = totals[f'{col}_count']
+        elif func == 'mean':
+            result[name] = totals[f'{col}_sum'] / totals[f'{col}_count'].where(totals[f'{col}_count'] > 0)
+        else:
+            raise ValueError(f"Hàm tổng hợp không được hỗ trợ: {func}")
+    return pd.DataFrame(result, index=totals.index)
+
+
+def total(cube, col, func='sum'):
+    return rollup(cube, [], value=(col, func))['value'].iloc[0]
+
+
+def select_country(cube, country):
+    # Cube của nhiều quốc gia (mọi độ chi tiết bắt đầu bằng 'Country') -> cube của một quốc gia
+    selected = {}
+    for grain, table in cube.items():
+        if grain[:1] == ('Country',):
+            rows = table[table['Country'] == country]
+            selected[grain[1:]] = rows.drop(columns='Country').reset_index(drop=True)
+    return selected
+
+
+def merge_cubes(*cubes):
+    # Các số đo trong cube đều là tổng và số đếm nên gộp hai cube chỉ cần cộng các ô trùng khóa ở từng độ chi tiết
+    cubes = [cube for cube in cubes if cube]
+    if not cubes:
+        return None
+    merged = {}
+    for grain in dict.fromkeys(grain for cube in cubes for grain in cube):
+        tables = [cube[grain] for cube in cubes if grain in cube]
+        merged[grain] = _aggregate_table(pd.concat(tables, ignore_index=True), grain)
+    return merged
+
+
+def cube_to_frame(cube):
+    # Một bảng dài để ghi xuống Parquet: cột 'grain' ghi tên các cột nhóm của từng dòng
+    frames = [table.assign(grain='|'.join(grain)) for grain, table in cube.items()]
+    return pd.concat(frames, ignore_index=True)
+
+
+def cube_from_frame(frame):
+    cube = {}
+    for key, table in frame.groupby('grain', observed=True, sort=False):
+        grain = tuple(key.split('|')) if key else ()
+        cube[grain] = table[[*grain, *measure_names()]].reset_index(drop=True)
+    return cube
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from columnar_cache import CACHE_ROOT, read_cached, replace_atomic, schema_cache_key, write_cache
+from ingest import iter_chunks, read_options
+from pipeline import clean_data
+from profiling import NO_PERF
+from schema import optimize_dtypes
+
+STORE_DIR = CACHE_ROOT / 'store'
+REGISTRY_PATH = STORE_DIR / 'registry.json'
+INFO_KEY = b'superstore.info'
+# Sổ đăng ký được đọc-sửa-ghi bởi nhiều phiên và job nền trong cùng tiến trình server
+REGISTRY_LOCK = threading.Lock()
+
+
+def frame_key(fingerprint, country=None, options=None):
+    # Khóa của dữ liệu gốc là fingerprint; dữ liệu đã làm sạch thêm quốc gia và tuỳ chọn tiền xử lý
+    if country is None and options is None:
+        return fingerprint
+    payload = json.dumps([fingerprint, country, options], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def store_path(key):
+    return STORE_DIR / f'{key}.arrow'
+
+
+def has_frame(key):
+    return store_path(key).exists()
+
+
+def write_frame(key, df, info=None):
+    # Arrow IPC không nén để mọi phiên (và mọi tiến trình) memory-map cùng một file;
+    # info (số NaT, thời gian giao hàng trung bình...) được ghi vào metadata của schema
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowException, ValueError):
+        # Cột object có kiểu trộn lẫn không chuyển được sang Arrow, phiên này dùng bản trong bộ nhớ
+        return False
+    if info is not None:
+        metadata = {**(table.schema.metadata or {}), INFO_KEY: json.dumps(info, default=str).encode('utf-8')}
+        table = table.replace_schema_metadata(metadata)
+    replace_atomic(store_path(key), lambda tmp_path: _write_table(tmp_path, table))
+    return True
+
+
+def _write_table(path, table):
+    with pa.OSFile(str(path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def open_frame(key):
+    # Trả về (df, info) đọc qua memory map, None nếu chưa có. Cột số và ngày không có giá trị thiếu
+    # trỏ thẳng vào vùng nhớ được map (chỉ đọc); cột chuỗi giữ dạng Arrow thay vì tạo đối tượng Python
+    path = store_path(key)
+    if not path.exists():
+        return None
+    table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+    df = table.to_pandas(split_blocks=True, types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+    info = json.loads((table.schema.metadata or {}).get(INFO_KEY, b'null'))
+    return df, info
+
+
+def load_registry():
+    if not REGISTRY_PATH.exists():
+        return {}
+    return json.loads(REGISTRY_PATH.read_text(encoding='utf-8'))
+
+
+def register_dataset(name, fingerprint, rows):
+    # Sổ đăng ký dùng chung: tên dataset -> fingerprint, để phiên khác mở lại mà không cần upload.
+    # Hai file khác nội dung cùng tên được phân biệt bằng đầu fingerprint; trả về tên đã đăng ký
+    with REGISTRY_LOCK:
+        registry = load_registry()
+        entry = registry.get(name)
+        if entry is not None and entry['fingerprint'] != fingerprint:
+            name = f'{name} ({fingerprint[:8]})'
+        registry[name] = {
+            'fingerprint': fingerprint,
+            'rows': rows,
+            'registered_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        text = json.dumps(registry, ensure_ascii=False, indent=2)
+        replace_atomic(REGISTRY_PATH, lambda tmp_path: Path(tmp_path).write_text(text, encoding='utf-8'))
+    return name
+
+
+def list_shared():
+    # Chỉ liệt kê các dataset còn file trong kho
+    return sorted(name for name, entry in load_registry().items() if store_path(entry['fingerprint']).exists())
+
+
+def load_shared(fingerprint, file, perf=NO_PERF):
+    # Dữ liệu gốc dùng chung: mở từ kho nếu đã có, nếu không thì đọc file theo từng chunk
+    # (số dòng đã đọc được cập nhật liên tục vào stage), thu gọn kiểu dữ liệu rồi ghi vào kho.
+    # Chỉ đọc các cột trong schema của dashboard với kiểu khai báo sẵn; cột chi tiết đọc riêng khi xem trước
+    shared = open_frame(fingerprint)
+    if shared is not None:
+        return shared[0]
+
+    with perf.stage('load/parse') as stage:
+        options = read_options(file)
+        cache_key = schema_cache_key(fingerprint) if options else fingerprint
+        df = read_cached(cache_key)
+        if df is None:
+            chunks = []
+            stage['rows_out'] = 0
+            for chunk in iter_chunks(file, **options):
+                chunks.append(chunk)
+                stage['rows_out'] += len(chunk)
+            df = pd.concat(chunks, ignore_index=True)
+            write_cache(cache_key, df)
+        stage['rows_out'] = len(df)
+
+    with perf.stage('load/optimize_dtypes', rows_in=len(df)):
+        df = optimize_dtypes(df)
+
+    with perf.stage('load/store', rows_in=len(df)):
+        if not write_frame(fingerprint, df):
+            return df
+        register_dataset(getattr(file, 'name', str(file)), fingerprint, len(df))
+        return open_frame(fingerprint)[0]
+
+
+def clean_shared(fingerprint, country, options, df, perf=NO_PERF, row_hashes=None):
+    # Kết quả làm sạch theo (fingerprint, quốc gia, tuỳ chọn), trả về (df_cleaned, info)
+    key = frame_key(fingerprint, country, options)
+    shared = open_frame(key)
+    if shared is not None:
+        return shared
+    df_cleaned, info = clean_data(df, country, options, perf, row_hashes=row_hashes)
+    with perf.stage('clean/store', rows_in=len(df_cleaned)):
+        if not write_frame(key, df_cleaned, info):
+            return df_cleaned, info
+        return open_frame(key)
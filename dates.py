@@ -0,0 +1,64 @@
+import datetime
+
+import pandas as pd
+
+DATE_COLUMNS = ['Order Date', 'Ship Date']
+# Các định dạng thường gặp: ISO trong file CSV đã xử lý, tháng/ngày/năm trong file xlsx gốc
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%d.%m.%Y', '%d-%m-%Y', '%Y/%m/%d', '%Y-%m-%d %H:%M:%S']
+EXCEL_FORMAT = 'excel'
+DATETIME_FORMAT = 'datetime'
+# Ngày gốc của số seri ngày trong Excel
+EXCEL_ORIGIN = '1899-12-30'
+SAMPLE_SIZE = 1000
+# Tỉ lệ tối thiểu của mẫu phải khớp định dạng (cho phép một vài giá trị lỗi trong dữ liệu)
+MIN_MATCH_RATIO = 0.9
+
+
+def detect_date_format(values, sample_size=SAMPLE_SIZE):
+    # Dò định dạng một lần trên mẫu nhỏ, trả về None nếu không khớp định dạng nào
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return DATETIME_FORMAT
+    sample = values.dropna().head(sample_size)
+    if sample.empty:
+        return None
+    if pd.api.types.is_numeric_dtype(sample):
+        return EXCEL_FORMAT
+    if sample.map(lambda x: isinstance(x, (datetime.date, pd.Timestamp))).all():
+        return DATETIME_FORMAT
+
+    sample = pd.Series(sample.astype(str).str.strip().unique())
+    best_format, best_ratio = None, MIN_MATCH_RATIO
+    for fmt in DATE_FORMATS:
+        ratio = pd.to_datetime(sample, format=fmt, errors='coerce').notna().mean()
+        if ratio == 1:
+            return fmt
+        if ratio >= best_ratio:
+            best_format, best_ratio = fmt, ratio
+    return best_format
+
+
+def parse_date_column(values, fmt):
+    if fmt == DATETIME_FORMAT:
+        return pd.to_datetime(values, errors='coerce')
+    if fmt == EXCEL_FORMAT:
+        return pd.to_datetime(pd.to_numeric(values, errors='coerce'), unit='D', origin=EXCEL_ORIGIN)
+
+    # Mỗi chuỗi ngày khác nhau chỉ được phân tích một lần, kết quả trải lại theo mã factorize
+    codes, uniques = pd.factorize(values)
+    parsed = pd.DatetimeIndex(pd.to_datetime(uniques, format=fmt, errors='coerce'))
+    return pd.Series(parsed.take(codes, allow_fill=True, fill_value=pd.NaT), index=values.index, name=values.name)
+
+
+def parse_dates(df, columns=DATE_COLUMNS):
+    formats = {}
+    nat_counts = {}
+    for col in columns:
+        if col not in df.columns:
+            continue
+        formats[col] = detect_date_format(df[col])
+        df[col] = parse_date_column(df[col], formats[col])
+        nat_counts[col] = int(df[col].isna().sum())
+
+    if 'Order Date' in df.columns and 'Ship Date' in df.columns:
+        df['Delivery Time'] = (df['Ship Date'] - df['Order Date']).dt.days
+    return df, formats, nat_counts
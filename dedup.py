@@ -0,0 +1,51 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from columnar_cache import CACHE_DIR, replace_atomic
+
+
+def row_hashes(df, key_columns=None):
+    # Băm 64-bit mỗi dòng một lần (vector hoá), cột category chỉ băm danh mục rồi ánh xạ qua mã
+    cols = [col for col in key_columns or [] if col in df.columns] or list(df.columns)
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+
+
+def duplicated_hashes(hashes):
+    # Đánh dấu các dòng trùng (giữ lần xuất hiện đầu tiên), giống drop_duplicates(keep='first')
+    return pd.Series(hashes, copy=False).duplicated().to_numpy()
+
+
+def drop_duplicate_rows(df, key_columns=None, hashes=None):
+    if hashes is None:
+        hashes = row_hashes(df, key_columns)
+    return df[~duplicated_hashes(hashes)]
+
+
+def hash_index_path(fingerprint, columns, key_columns=None):
+    # Mỗi tập cột khóa có một file chỉ mục riêng, đặt cạnh file Parquet của dataset; tập cột đã đọc cũng
+    # thuộc khóa vì khi thiếu cột khóa thì băm cả dòng (bản đủ cột của batch.py khác bản theo schema của dashboard)
+    key_id = 'all'
+    if key_columns:
+        key_id = hashlib.sha1('\x1f'.join(key_columns).encode('utf-8')).hexdigest()[:12]
+    columns_id = hashlib.sha1('\x1f'.join(map(str, columns)).encode('utf-8')).hexdigest()[:12]
+    return CACHE_DIR / f'{fingerprint}.rowhash-{key_id}-{columns_id}.npy'
+
+
+def _save_hashes(path, hashes):
+    # np.save với tên file sẽ tự thêm đuôi .npy, ghi qua file object để giữ đúng tên file tạm
+    with open(path, 'wb') as f:
+        np.save(f, hashes)
+
+
+def load_row_hashes(fingerprint, df, key_columns=None):
+    # Đọc chỉ mục băm đã lưu; lần đầu tính trên toàn bộ file rồi ghi lại để lần upload sau dùng lại
+    path = hash_index_path(fingerprint, df.columns, key_columns)
+    if path.exists():
+        hashes = np.load(path)
+        if len(hashes) == len(df):
+            return hashes
+    hashes = row_hashes(df, key_columns)
+    replace_atomic(path, lambda tmp_path: _save_hashes(tmp_path, hashes))
+    return hashes
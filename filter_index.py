@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+FILTER_COLUMNS = ['Segment', 'Category', 'Sub-Category', 'Ship Mode', 'Order Priority']
+DATE_COLUMN = 'Order Date'
+
+
+class FilterIndex:
+    # Dựng một lần cho mỗi bảng đã làm sạch: bitmap nén (packbits) cho từng giá trị của các cột lọc và
+    # thứ tự các dòng theo ngày; kết hợp bộ lọc chỉ là phép OR/AND trên bitmap, không quét lại bảng
+    def __init__(self, df, columns=FILTER_COLUMNS, date_column=DATE_COLUMN):
+        self.n_rows = len(df)
+        self.values = {}
+        self.bitmaps = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=True)
+            self.values[col] = {value: code for code, value in enumerate(uniques)}
+            self.bitmaps[col] = np.array([np.packbits(codes == code) for code in range(len(uniques))],
+                                         dtype=np.uint8).reshape(len(uniques), -1)
+
+        # NaT được numpy xếp cuối nên tìm kiếm nhị phân trên mảng đã sắp xếp vẫn đúng
+        dates = df[date_column].to_numpy(dtype='datetime64[ns]')
+        self.date_order = np.argsort(dates, kind='stable')
+        self.sorted_dates = dates[self.date_order]
+
+    @property
+    def nbytes(self):
+        bitmaps = sum(bitmap.nbytes for bitmap in self.bitmaps.values())
+        return bitmaps + self.date_order.nbytes + self.sorted_dates.nbytes
+
+    def date_range(self):
+        valid = self.sorted_dates[~np.isnat(self.sorted_dates)]
+        if not len(valid):
+            return None
+        return pd.Timestamp(valid[0]).date(), pd.Timestamp(valid[-1]).date()
+
+    def date_bitmap(self, start, end):
+        # Khoảng ngày [start, end] (tính cả ngày cuối) qua hai lần searchsorted
+        lo = np.searchsorted(self.sorted_dates, np.datetime64(pd.Timestamp(start), 'ns'), side='left')
+        hi = np.searchsorted(self.sorted_dates, np.datetime64(pd.Timestamp(end) + pd.Timedelta(days=1), 'ns'),
+                             side='left')
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.date_order[lo:hi]] = True
+        return np.packbits(mask)
+
+    def select(self, selected=None, date_range=None):
+        # selected: {cột: các giá trị được chọn}; trả về vị trí các dòng thoả mãn, None nếu không có bộ lọc nào
+        bitmap = None
+        for col, chosen in (selected or {}).items():
+            if not chosen or col not in self.values:
+                continue
+            codes = [self.values[col][value] for value in chosen if value in self.values[col]]
+            union = np.bitwise_or.reduce(self.bitmaps[col][codes], axis=0) if codes else \
+                np.zeros(self.bitmaps[col].shape[1], dtype=np.uint8)
+            bitmap = union if bitmap is None else bitmap & union
+        if date_range is not None:
+            dates = self.date_bitmap(*date_range)
+            bitmap = dates if bitmap is None else bitmap & dates
+        if bitmap is None:
+            return None
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n_rows))
@@ -0,0 +1,93 @@
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+from cube import covering_table, rollup
+
+SEASON_LENGTH = 12
+HARMONICS = 3
+FORECAST_HORIZON = 6
+INTERVAL_LEVEL = 0.95
+TOTAL_LABEL = 'Tổng'
+# Các cách chia chuỗi để dự báo trong phần trực quan hoá (dữ liệu của một quốc gia)
+FORECAST_GROUPS = {
+    TOTAL_LABEL: [],
+    'Phân khúc': ['Segment'],
+    'Danh mục con': ['Sub-Category'],
+    'Danh mục con × Thành phố': ['Sub-Category', 'City'],
+}
+
+
+def monthly_matrix(cube, by, metric='Sales'):
+    # Bảng chuỗi x tháng (đủ các tháng, tháng không có đơn = 0) cộng dồn từ cube
+    series = rollup(cube, [*by, 'Month'], value=(metric, 'sum'))['value']
+    if by:
+        wide = series.unstack('Month', fill_value=0)
+    else:
+        wide = series.to_frame(TOTAL_LABEL).T
+    months = pd.date_range(wide.columns.min(), wide.columns.max(), freq='MS')
+    return wide.reindex(columns=months, fill_value=0)
+
+
+def design_matrix(t, n_train, harmonics, offset, season=SEASON_LENGTH):
+    # Hệ số chặn, xu hướng tuyến tính và các cặp sin/cos cho mùa vụ theo tháng trong năm
+    columns = [np.ones(len(t)), t / max(n_train, 1)]
+    for k in range(1, harmonics + 1):
+        angle = 2 * np.pi * k * (t + offset) / season
+        columns += [np.sin(angle), np.cos(angle)]
+    return np.column_stack(columns)
+
+
+def fit_forecast(matrix, horizon=FORECAST_HORIZON, harmonics=HARMONICS, level=INTERVAL_LEVEL):
+    # Mọi chuỗi dùng chung một ma trận thiết kế nên chỉ cần một lần lstsq cho cả bảng (T x số chuỗi);
+    # khoảng dự báo: sigma của từng chuỗi nhân với hệ số phụ thuộc đòn bẩy của kỳ dự báo (chung cho mọi chuỗi)
+    values = matrix.to_numpy(dtype=np.float64).T
+    n_periods = values.shape[0]
+    # Chuỗi ngắn: giảm số hài để còn bậc tự do ước lượng phương sai
+    harmonics = min(harmonics, max((n_periods - 4) // 2, 0))
+    offset = matrix.columns[0].month - 1
+    design = design_matrix(np.arange(n_periods + horizon), n_periods, harmonics, offset)
+    train, future = design[:n_periods], design[n_periods:]
+
+    coef, _, _, _ = np.linalg.lstsq(train, values, rcond=None)
+    fitted = train @ coef
+    dof = max(n_periods - train.shape[1], 1)
+    sigma = np.sqrt(((values - fitted) ** 2).sum(axis=0) / dof)
+    leverage = np.einsum('ij,jk,ik->i', future, np.linalg.pinv(train.T @ train), future)
+    z = NormalDist().inv_cdf(0.5 + level / 2)
+
+    mean = future @ coef
+    half_width = z * np.sqrt(1 + leverage)[:, None] * sigma[None, :]
+    lower, upper = mean - half_width, mean + half_width
+    # Chuỗi chưa từng âm (doanh số, số lượng) thì cận dưới không xuống dưới 0
+    lower = np.where((values >= 0).all(axis=0), np.maximum(lower, 0), lower)
+
+    future_months = pd.date_range(matrix.columns[-1] + pd.offsets.MonthBegin(), periods=horizon, freq='MS')
+    return {
+        'actual': matrix,
+        'fitted': pd.DataFrame(fitted.T, index=matrix.index, columns=matrix.columns),
+        'mean': pd.DataFrame(mean.T, index=matrix.index, columns=future_months),
+        'lower': pd.DataFrame(lower.T, index=matrix.index, columns=future_months),
+        'upper': pd.DataFrame(upper.T, index=matrix.index, columns=future_months),
+    }
+
+
+def batch_forecast(cube, by, metric='Sales', horizon=FORECAST_HORIZON):
+    table = covering_table(cube, [*by, 'Month'])
+    if table is None or table.empty:
+        return None
+    return fit_forecast(monthly_matrix(cube, by, metric), horizon)
+
+
+def forecast_summary(result):
+    # Một dòng cho mỗi chuỗi: 12 tháng gần nhất, tổng dự báo và khoảng của tháng kế tiếp
+    actual, mean = result['actual'], result['mean']
+    summary = pd.DataFrame({
+        'last_12_months': actual.iloc[:, -SEASON_LENGTH:].sum(axis=1),
+        'forecast_total': mean.sum(axis=1),
+        'next_month': mean.iloc[:, 0],
+        'next_lower': result['lower'].iloc[:, 0],
+        'next_upper': result['upper'].iloc[:, 0],
+    })
+    return summary.sort_values('forecast_total', ascending=False)
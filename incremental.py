@@ -0,0 +1,229 @@
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from columnar_cache import CACHE_ROOT, load_columnar, replace_atomic
+from cube import build_cube, cube_from_frame, cube_to_frame, merge_cubes
+from dedup import duplicated_hashes, row_hashes
+from pipeline import DEFAULT_OPTIONS, NUMERIC_COLS, clean_all
+from profiling import NO_PERF
+from schema import optimize_dtypes
+from sketches import QuantileSketch
+
+DATASETS_DIR = CACHE_ROOT / 'datasets'
+# Khóa để nhận biết một dòng đã có trong dataset
+KEY_COLUMNS = ['Row ID', 'Order ID']
+# Mỗi lần nối thêm chỉ ghi file mới (phần dữ liệu, khóa của phần đó, cube và sketch theo phiên bản);
+# state.json được ghi sau cùng và trỏ tới các file hiện hành, nên lần ghi bị ngắt giữa chừng không làm
+# lệch dataset và lần thử lại ghi đè đúng các file đó
+VERSIONED_FILES = ['cube', 'sketches']
+# Tên dataset là tên thư mục: chỉ chữ, số, '_' và '-' (không thể thoát ra ngoài DATASETS_DIR)
+DATASET_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+# Mỗi dataset một khóa: các phiên nối thêm cùng lúc đọc state -> ghi phần -> ghi state lần lượt
+_dataset_locks = {}
+_locks_lock = threading.Lock()
+# Cột luôn ghi dạng số thực dù phần dữ liệu này toàn số nguyên (có thể có NaN hoặc trung vị lẻ ở phần khác)
+FLOAT_COLUMNS = [*NUMERIC_COLS, 'Delivery Time']
+
+
+def valid_dataset_name(name):
+    return bool(DATASET_NAME_PATTERN.match(name or ''))
+
+
+def dataset_dir(name):
+    if not valid_dataset_name(name):
+        raise ValueError(f"Tên dataset không hợp lệ: '{name}' (chỉ dùng chữ, số, '_' và '-')")
+    return DATASETS_DIR / name
+
+
+def dataset_lock(name):
+    with _locks_lock:
+        return _dataset_locks.setdefault(name, threading.Lock())
+
+
+def list_datasets():
+    if not DATASETS_DIR.exists():
+        return []
+    return sorted(path.name for path in DATASETS_DIR.iterdir() if (path / 'state.json').exists())
+
+
+def load_state(name):
+    path = dataset_dir(name) / 'state.json'
+    if not path.exists():
+        return {'name': name, 'rows': 0, 'parts': [], 'countries': [], 'appends': []}
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def _write_json(path, data):
+    text = json.dumps(data, ensure_ascii=False, indent=2, default=str)
+    replace_atomic(path, lambda tmp_path: Path(tmp_path).write_text(text, encoding='utf-8'))
+
+
+def _save_keys(path, keys):
+    with open(path, 'wb') as f:
+        np.save(f, keys)
+
+
+def _keys_path(name, part):
+    return dataset_dir(name) / 'keys' / part.replace('.parquet', '.npy')
+
+
+def _current_path(name, state, kind):
+    # None khi dataset chưa có phần dữ liệu nào
+    return dataset_dir(name) / state[kind] if kind in state else None
+
+
+def load_keys(name, state=None):
+    # Khóa của các phần dữ liệu, mỗi phần một file
+    state = state or load_state(name)
+    keys = [np.load(_keys_path(name, part)) for part in state['parts']]
+    return np.concatenate(keys) if keys else np.empty(0, dtype=np.uint64)
+
+
+def load_sketches(name, state=None):
+    path = _current_path(name, state or load_state(name), 'sketches')
+    if path is None:
+        return {}
+    data = json.loads(path.read_text(encoding='utf-8'))
+    return {country: {col: QuantileSketch.from_dict(sketch) for col, sketch in cols.items()}
+            for country, cols in data.items()}
+
+
+def load_cube(name, state=None):
+    path = _current_path(name, state or load_state(name), 'cube')
+    if path is None:
+        return None
+    # Bảng tổng hợp giữ nguyên kiểu khi đọc (không thu nhỏ các cột tổng)
+    return cube_from_frame(pd.read_parquet(path))
+
+
+def part_paths(name):
+    return [str(dataset_dir(name) / 'parts' / part) for part in load_state(name)['parts']]
+
+
+def load_rows(name, country=None, columns=None):
+    # Đọc các phần dữ liệu đã làm sạch, đẩy bộ lọc quốc gia xuống lúc đọc Parquet
+    paths = part_paths(name)
+    if not paths:
+        return None
+    filters = [('Country', '==', country)] if country is not None else None
+    return optimize_dtypes(pd.read_parquet(paths, columns=columns, filters=filters))
+
+
+def _plain_columns(df):
+    # Ghi cột category dưới dạng chuỗi để các phần Parquet có cùng schema khi đọc gộp
+    categorical = df.select_dtypes(include='category').columns
+    return df.astype({col: object for col in categorical})
+
+
+def _part_schema(df):
+    # Mọi phần ghi cùng một schema, không phụ thuộc kiểu optimize_dtypes chọn cho riêng phần đó,
+    # để pd.read_parquet/DuckDB/Polars đọc gộp được: số nguyên int64, số thực float64, chuỗi string
+    fields = []
+    for col, dtype in df.dtypes.items():
+        if col in FLOAT_COLUMNS or pd.api.types.is_float_dtype(dtype):
+            kind = pa.float64()
+        elif pd.api.types.is_integer_dtype(dtype):
+            kind = pa.int64()
+        elif pd.api.types.is_bool_dtype(dtype):
+            kind = pa.bool_()
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            kind = pa.timestamp('ns')
+        else:
+            kind = pa.string()
+        fields.append(pa.field(col, kind))
+    return pa.schema(fields)
+
+
+def _write_part(path, df):
+    df = _plain_columns(df)
+    pq.write_table(pa.Table.from_pandas(df, schema=_part_schema(df), preserve_index=False), path)
+
+
+def append_dataset(name, df, options=None, perf=NO_PERF):
+    path = dataset_dir(name)
+    with dataset_lock(name):
+        return _append_locked(name, path, df, options, perf)
+
+
+def _append_locked(name, path, df, options, perf):
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    state = load_state(name)
+    if state['parts'] and state.get('options', options) != options:
+        raise ValueError(f"Dataset '{name}' đã được tạo với tuỳ chọn tiền xử lý khác")
+    start = time.perf_counter()
+
+    # Chỉ giữ các dòng chưa có trong dataset (và không trùng nhau trong chính file mới)
+    with perf.stage('append/dedup', rows_in=len(df)) as stage:
+        # Băm 64-bit của khóa dòng ('Row ID', 'Order ID'); nếu thiếu cột khóa thì băm toàn bộ dòng
+        keys = row_hashes(df, KEY_COLUMNS)
+        is_new = ~np.isin(keys, load_keys(name, state)) & ~duplicated_hashes(keys)
+        delta = df[is_new]
+        stage['rows_out'] = len(delta)
+
+    summary = {'dataset': name, 'rows_in': len(df), 'rows_new': len(delta), 'rows_skipped': int((~is_new).sum())}
+    if delta.empty:
+        summary['seconds'] = round(time.perf_counter() - start, 3)
+        return summary
+
+    # Làm sạch mọi quốc gia của phần dữ liệu mới trong một lượt theo nhóm; biên ngoại lai của mỗi quốc gia
+    # lấy từ sketch đã gộp với lịch sử
+    sketches = load_sketches(name, state)
+    cleaned_delta = clean_all(delta, options, perf, sketches=sketches).reset_index(drop=True)
+
+    with perf.stage('append/write', rows_in=len(cleaned_delta)):
+        version = len(state['parts'])
+        part_name = f'part-{version:05d}.parquet'
+        replace_atomic(path / 'parts' / part_name, lambda tmp_path: _write_part(tmp_path, cleaned_delta))
+        replace_atomic(_keys_path(name, part_name), lambda tmp_path: _save_keys(tmp_path, keys[is_new]))
+
+        # Các tổng hợp chỉ cần cộng thêm cube (nhỏ, theo từng độ chi tiết) của phần dữ liệu mới
+        previous = {kind: _current_path(name, state, kind) for kind in VERSIONED_FILES}
+        cube = merge_cubes(load_cube(name, state), build_cube(cleaned_delta, ('Country',)))
+        cube_name = f'cube-{version:05d}.parquet'
+        replace_atomic(path / cube_name,
+                       lambda tmp_path: _plain_columns(cube_to_frame(cube)).to_parquet(tmp_path, index=False))
+        sketches_name = f'sketches-{version:05d}.json'
+        _write_json(path / sketches_name, {country: {col: sketch.to_dict() for col, sketch in cols.items()}
+                                           for country, cols in sketches.items()})
+
+        summary['seconds'] = round(time.perf_counter() - start, 3)
+        state['parts'].append(part_name)
+        state['cube'] = cube_name
+        state['sketches'] = sketches_name
+        state['rows'] += len(cleaned_delta)
+        state['countries'] = sorted(set(state['countries']) | set(cleaned_delta['Country'].dropna().astype(str)))
+        state['options'] = options
+        state['appends'].append({'at': datetime.now().isoformat(timespec='seconds'), **summary})
+        _write_json(path / 'state.json', state)
+
+        # Phiên bản cũ của cube và sketch không còn được state trỏ tới
+        for kind, old_path in previous.items():
+            if old_path is not None and old_path.name != state[kind]:
+                old_path.unlink(missing_ok=True)
+
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nối thêm một file dữ liệu mới vào dataset tích luỹ")
+    parser.add_argument('name', help="Tên dataset")
+    parser.add_argument('path', help="File .csv hoặc .xlsx chứa các đơn hàng mới")
+    args = parser.parse_args(argv)
+
+    summary = append_dataset(args.name, optimize_dtypes(load_columnar(args.path)))
+    print(f"{args.name}: thêm {summary['rows_new']} dòng mới, bỏ qua {summary['rows_skipped']} dòng đã có "
+          f"({summary['seconds']}s)")
+
+
+if __name__ == '__main__':
+    main()
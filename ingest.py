@@ -0,0 +1,118 @@
+import pandas as pd
+from openpyxl import load_workbook
+
+from dates import DATE_FORMATS, SAMPLE_SIZE, detect_date_format, parse_date_column
+from schema import COLUMN_SCHEMA, PREVIEW_ROWS, read_dtypes, schema_columns
+
+CHUNK_SIZE = 100_000
+
+
+def _file_name(file):
+    return getattr(file, 'name', str(file))
+
+
+def _rewind(file):
+    if hasattr(file, 'seek'):
+        file.seek(0)
+
+
+def _iter_csv_chunks(file, usecols, country, chunksize, dtype, date_formats):
+    for chunk in pd.read_csv(file, usecols=usecols, chunksize=chunksize, dtype=dtype):
+        # Cột ngày được phân tích ngay khi đọc theo định dạng đã dò (mỗi chuỗi khác nhau phân tích một lần,
+        # giá trị sai thành NaT); nhanh hơn parse_dates của read_csv khi có kèm dtype
+        for col, fmt in (date_formats or {}).items():
+            chunk[col] = parse_date_column(chunk[col], fmt)
+        if country is not None:
+            chunk = chunk[chunk['Country'] == country]
+        yield chunk
+
+
+def _iter_xlsx_chunks(file, usecols, country, chunksize):
+    # Chế độ read_only của openpyxl đọc từng dòng, không nạp cả sheet vào bộ nhớ
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        keep = [i for i, name in enumerate(header) if usecols is None or name in usecols]
+        columns = [header[i] for i in keep]
+        country_idx = header.index('Country') if country is not None else None
+
+        buffer = []
+        for row in rows:
+            # Lọc quốc gia ngay khi đọc dòng, trước khi tạo DataFrame
+            if country_idx is not None and row[country_idx] != country:
+                continue
+            buffer.append([row[i] for i in keep])
+            if len(buffer) >= chunksize:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_chunks(file, usecols=None, country=None, chunksize=CHUNK_SIZE, dtype=None, date_formats=None):
+    if usecols is not None and country is not None and 'Country' not in usecols:
+        usecols = list(usecols) + ['Country']
+    _rewind(file)
+    name = _file_name(file)
+    if name.endswith('.csv'):
+        yield from _iter_csv_chunks(file, usecols, country, chunksize, dtype, date_formats)
+    elif name.endswith('.xlsx'):
+        # Ô Excel đã có kiểu (số, ngày) nên chỉ cần chọn cột
+        yield from _iter_xlsx_chunks(file, usecols, country, chunksize)
+    else:
+        raise ValueError(f"Định dạng file không được hỗ trợ: {name}")
+
+
+def read_options(file):
+    # usecols/dtype/định dạng ngày cho trình đọc, theo schema của dashboard; {} (đọc mọi cột) nếu file
+    # không theo schema. Định dạng ngày được dò một lần trên mẫu đầu file.
+    usecols = schema_columns(read_columns(file))
+    if usecols is None:
+        return {}
+    options = {'usecols': usecols, 'dtype': read_dtypes(usecols)}
+    date_columns = [col for col in usecols if COLUMN_SCHEMA[col] == 'date']
+    if date_columns and _file_name(file).endswith('.csv'):
+        _rewind(file)
+        sample = pd.read_csv(file, usecols=date_columns, nrows=SAMPLE_SIZE, dtype=str)
+        formats = {col: detect_date_format(sample[col]) for col in date_columns}
+        options['date_formats'] = {col: fmt for col, fmt in formats.items() if fmt in DATE_FORMATS}
+    return options
+
+
+def read_preview(file, nrows=PREVIEW_ROWS):
+    # Vài dòng đầu với mọi cột (kể cả cột chi tiết), chỉ đọc khi người dùng mở phần xem dữ liệu gốc
+    return next(iter_chunks(file, chunksize=nrows), pd.DataFrame())
+
+
+def read_columns(file):
+    _rewind(file)
+    name = _file_name(file)
+    if name.endswith('.csv'):
+        return list(pd.read_csv(file, nrows=0).columns)
+    workbook = load_workbook(file, read_only=True)
+    try:
+        return list(next(workbook.active.iter_rows(values_only=True), ()))
+    finally:
+        workbook.close()
+
+
+def read_countries(file, chunksize=CHUNK_SIZE):
+    # Lượt đọc đầu tiên chỉ lấy cột 'Country' để dựng danh sách quốc gia
+    countries = set()
+    for chunk in iter_chunks(file, usecols=['Country'], chunksize=chunksize):
+        countries.update(chunk['Country'].dropna().unique())
+    return sorted(countries)
+
+
+def load_country(file, country, usecols=None, chunksize=CHUNK_SIZE, dtype=None, date_formats=None):
+    # Bộ nhớ đỉnh phụ thuộc vào kích thước chunk và số dòng của quốc gia được chọn
+    chunks = list(iter_chunks(file, usecols=usecols, country=country, chunksize=chunksize, dtype=dtype,
+                              date_formats=date_formats))
+    if not chunks:
+        return pd.DataFrame(columns=usecols)
+    return pd.concat(chunks, ignore_index=True)
@@ -0,0 +1,137 @@
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+from dataset_store import clean_shared, load_shared
+from dedup import load_row_hashes
+
+logger = logging.getLogger('superstore.jobs')
+
+JOB_WORKERS = 2
+# File upload lớn hơn ngưỡng này (byte) mặc định được xử lý nền
+BACKGROUND_MIN_BYTES = 20 * 2 ** 20
+# Job đã kết thúc được giữ lại trong khoảng này (giây) để các lần tải lại trang còn đọc được kết quả
+JOB_RETENTION = 3600
+LOAD_STAGES = ['load/parse', 'load/optimize_dtypes', 'load/store']
+CLEAN_STAGES = ['clean/row_hashes', 'clean/filter_dedup_fill', 'clean/dates', 'clean/outliers', 'clean/postal_codes',
+                'clean/optimize_dtypes', 'clean/store']
+
+
+class JobProgress:
+    # Cùng giao diện stage() với PerfRecorder nên truyền thẳng vào clean_data/load_shared;
+    # giao diện đọc tiến độ từ luồng khác nên danh sách bước được bảo vệ bằng khóa
+    def __init__(self):
+        self.stages = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        record = {'stage': name, 'status': 'running', 'rows_in': rows_in, 'rows_out': None, 'seconds': None}
+        with self._lock:
+            self.stages.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        except BaseException:
+            record['status'] = 'error'
+            raise
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 3)
+            if record['status'] == 'running':
+                record['status'] = 'done'
+
+    def to_frame(self):
+        with self._lock:
+            return pd.DataFrame([dict(record) for record in self.stages],
+                                columns=['stage', 'status', 'rows_in', 'rows_out', 'seconds'])
+
+
+class Job:
+    def __init__(self, key, label, expected_stages):
+        self.key = key
+        self.label = label
+        self.expected_stages = expected_stages
+        self.progress = JobProgress()
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.status in ('done', 'error')
+
+    @property
+    def fraction(self):
+        finished = sum(record['status'] == 'done' for record in self.progress.stages
+                       if record['stage'] in self.expected_stages)
+        return min(finished / len(self.expected_stages), 1.0)
+
+
+# Bộ chạy job dùng chung cho cả tiến trình: job không gắn với lần chạy script nên không bị huỷ khi trang tải lại
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='superstore-job')
+_jobs = {}
+_lock = threading.Lock()
+
+
+def _prune():
+    now = time.time()
+    for key in [key for key, job in _jobs.items() if job.done and now - job.finished > JOB_RETENTION]:
+        del _jobs[key]
+
+
+def submit(key, label, expected_stages, fn, *args):
+    # Mỗi khóa chỉ có một job: job đang chạy hoặc đã xong được dùng lại, job lỗi được chạy lại
+    with _lock:
+        _prune()
+        job = _jobs.get(key)
+        if job is not None and job.status != 'error':
+            return job
+        job = Job(key, label, expected_stages)
+        _jobs[key] = job
+
+    def run():
+        job.status = 'running'
+        try:
+            job.result = fn(*args, perf=job.progress)
+        except Exception as exc:
+            logger.exception('Job %s thất bại', key)
+            job.error = repr(exc)
+            job.finished = time.time()
+            job.status = 'error'
+        else:
+            job.finished = time.time()
+            job.status = 'done'
+
+    _executor.submit(run)
+    return job
+
+
+def get_job(key):
+    with _lock:
+        return _jobs.get(key)
+
+
+def detach_upload(uploaded_file):
+    # Job đọc bản sao nội dung file để không tranh vị trí đọc với luồng script
+    buffer = io.BytesIO(uploaded_file.getvalue())
+    buffer.name = uploaded_file.name
+    return buffer
+
+
+def load_job(fingerprint, file, perf):
+    load_shared(fingerprint, file, perf)
+
+
+def clean_job(fingerprint, country, options, df, perf):
+    row_hashes = None
+    if options['drop_duplicates']:
+        with perf.stage('clean/row_hashes', rows_in=len(df)):
+            row_hashes = load_row_hashes(fingerprint, df, options['dedup_keys'])
+    clean_shared(fingerprint, country, options, df, perf, row_hashes)
@@ -1,487 +1,353 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 
-@st.cache_data
-def load_data(file):
-    if file.name.endswith('.csv'):
-        return pd.read_csv(file)
-    elif file.name.endswith('.xlsx'):
-        return pd.read_excel(file)
+from artifact_cache import AGGREGATE_CACHE, DATA_CACHE, cache_stats, cached
+from charts import LARGE_DATA_ROWS
+from columnar_cache import load_columnar, read_cached, schema_cache_key
+from cube import build_cube, cube_size, select_country
+from dataset_store import clean_shared, frame_key, has_frame, list_shared, load_registry, load_shared, store_path
+from dedup import load_row_hashes
+from filter_index import FilterIndex
+from incremental import (append_dataset, list_datasets, load_cube, load_rows, load_state, part_paths,
+                         valid_dataset_name)
+from ingest import load_country, read_columns, read_countries, read_options, read_preview
+from jobs import (BACKGROUND_MIN_BYTES, CLEAN_STAGES, LOAD_STAGES, clean_job, detach_upload, get_job, load_job,
+                  submit)
+from outliers import OUTLIER_METHODS
+from pipeline import DEFAULT_OPTIONS, clean_all, clean_data, dataset_fingerprint
+from profiling import NO_PERF, PERF_LOG_ENABLED, PROFILERS, PerfRecorder, start_profiler, stop_profiler
+from query import QUERY_BACKENDS, query_cube
+from schema import optimize_dtypes
+from views import (SECTIONS, comparison_tables, render_filters, render_job_progress, render_raw_preview,
+                   render_section)
+
+# Dữ liệu được chuyển sang Parquet trên đĩa, dùng lại giữa các phiên và sau khi khởi động lại; bản dùng chung
+# nằm trong kho Arrow IPC và được memory-map, mọi phiên nhận cùng một DataFrame (không sao chép). Các kết quả
+# được giữ trong cache có giới hạn dung lượng (artifact_cache), mục ít dùng nhất bị đẩy ra trước
+@cached(DATA_CACHE, spinner="Đang tải dữ liệu...")
+def load_data(dataset_fingerprint, _file):
+    return load_shared(dataset_fingerprint, _file)
+
+# Kết quả tiền xử lý theo (fingerprint, quốc gia, tuỳ chọn) cũng nằm trong kho dùng chung, DataFrame gốc
+# không tham gia vào khóa cache (tham số bắt đầu bằng '_')
+@cached(DATA_CACHE, spinner="Đang xử lý dữ liệu...")
+def preprocess(dataset_fingerprint, country, options, _df, _perf=NO_PERF, _row_hashes=None):
+    return clean_shared(dataset_fingerprint, country, options, _df, _perf, _row_hashes)
+
+# Chỉ mục băm dòng của cả file, lưu cạnh cache Parquet nên lần upload lại không phải quét lại các dòng
+@cached(AGGREGATE_CACHE)
+def row_hash_index(dataset_fingerprint, key_columns, _df):
+    return load_row_hashes(dataset_fingerprint, _df, key_columns)
+
+# Cube tổng hợp được tính một lần cho mỗi (dataset, quốc gia, tuỳ chọn), các bảng và biểu đồ cộng dồn từ đây.
+# DuckDB/Polars đọc thẳng file Arrow của dữ liệu đã làm sạch trong kho; nếu dữ liệu chỉ có trong bộ nhớ thì dùng pandas
+@cached(AGGREGATE_CACHE, spinner="Đang tổng hợp dữ liệu...")
+def aggregate_cube(dataset_fingerprint, country, options, backend, _df_cleaned):
+    key = frame_key(dataset_fingerprint, country, options)
+    if backend != 'pandas' and has_frame(key):
+        return query_cube([store_path(key)], backend)
+    return query_cube(_df_cleaned, backend)
+
+# So sánh quốc gia: làm sạch mọi quốc gia trong một lượt rồi tính chỉ số từ cube toàn bộ dữ liệu
+@cached(AGGREGATE_CACHE, spinner="Đang so sánh các quốc gia...")
+def compare_countries(dataset_fingerprint, options, _df, _row_hashes=None):
+    df_all = clean_all(_df, options, row_hashes=_row_hashes)
+    return comparison_tables(df_all, build_cube(df_all, ('Country',)))
+
+# Vài dòng đầu với đủ mọi cột của file, chỉ đọc khi mở phần xem dữ liệu gốc
+@cached(DATA_CACHE)
+def load_preview(dataset_fingerprint, _file):
+    return read_preview(_file)
+
+# Đủ mọi cột của file (kể cả cột chi tiết) cho việc lưu file và nối vào dataset tích luỹ, đọc từ cache Parquet
+# đủ cột (lọc quốc gia khi đọc) và không giữ lại trong bộ nhớ. Dataset đã chia sẻ không còn file gốc:
+# trả về None nếu chưa có cache đủ cột
+def read_full(dataset_fingerprint, file, country=None):
+    filters = [('Country', '==', country)] if country is not None else None
+    df = read_cached(dataset_fingerprint, filters=filters)
+    if df is None and file is not None:
+        df = load_columnar(file, dataset_fingerprint)
+        if country is not None:
+            df = df[df['Country'] == country]
+    return None if df is None else optimize_dtypes(df)
+
+# Dữ liệu để lưu ra CSV: làm sạch đủ các cột một lần cho mỗi (dataset, quốc gia, tuỳ chọn)
+@cached(DATA_CACHE, spinner="Đang chuẩn bị dữ liệu để lưu...")
+def export_data(dataset_fingerprint, country, options, _file):
+    full_df = read_full(dataset_fingerprint, _file, country)
+    return None if full_df is None else clean_data(full_df, country, options)[0]
+
+# Chế độ đọc theo luồng: chỉ giữ trong bộ nhớ dữ liệu của quốc gia đang chọn
+@cached(AGGREGATE_CACHE, spinner="Đang đọc danh sách quốc gia...")
+def stream_countries(dataset_fingerprint, _file):
+    df = read_cached(schema_cache_key(dataset_fingerprint), columns=['Country'])
+    if df is not None:
+        return df['Country'].dropna().unique().tolist()
+    return read_countries(_file)
+
+@cached(DATA_CACHE, spinner="Đang đọc dữ liệu quốc gia...")
+def stream_country(dataset_fingerprint, country, _file):
+    # Nếu đã có cache Parquet thì đẩy bộ lọc quốc gia xuống lúc đọc file cột
+    df = read_cached(schema_cache_key(dataset_fingerprint), filters=[('Country', '==', country)])
+    if df is None:
+        df = load_country(_file, country, **read_options(_file))
+    return optimize_dtypes(df)
+
+# Dataset tích luỹ: dữ liệu đã làm sạch của quốc gia và phần cube tương ứng
+@cached(DATA_CACHE, spinner="Đang đọc dataset tích luỹ...")
+def load_stored(name, version, country, backend):
+    # Với DuckDB/Polars, cube của quốc gia được truy vấn thẳng trên các file Parquet (lọc khi đọc, đa luồng)
+    if backend == 'pandas':
+        cube = select_country(load_cube(name), country)
+    else:
+        cube = query_cube(part_paths(name), backend, country)
+    return load_rows(name, country), cube
+
+@cached(AGGREGATE_CACHE, spinner="Đang so sánh các quốc gia...")
+def compare_stored(name, version, backend):
+    cube = load_cube(name) if backend == 'pandas' else query_cube(part_paths(name), backend, by=('Country',))
+    return comparison_tables(load_rows(name, columns=['Country', 'Customer ID', 'Delivery Time']), cube)
+
+
+# Chỉ mục bitmap cho bộ lọc, dựng một lần cho mỗi bảng đã làm sạch và giữ nguyên đối tượng giữa các lần tải lại
+@cached(DATA_CACHE, spinner="Đang dựng chỉ mục bộ lọc...")
+def filter_index(cache_key, _df_cleaned):
+    return FilterIndex(_df_cleaned)
+
+@cached(DATA_CACHE, spinner="Đang lọc dữ liệu...")
+def filtered_view(cache_key, selected, date_range, _df_cleaned, _index):
+    df_view = _df_cleaned.take(_index.select(selected, date_range))
+    return df_view, build_cube(df_view)
+
+
+def render_dashboard(cache_key, selected_country, df_cleaned, cube, average_delivery_time, perf, comparison=None):
+    # Bộ lọc: giao các bitmap rồi tính lại cube trên các dòng được chọn
+    with perf.stage('filters/index', rows_in=len(df_cleaned)):
+        index = filter_index(cache_key, df_cleaned)
+    selected, date_range = render_filters(index)
+    if selected or date_range:
+        with perf.stage('filters/select', rows_in=len(df_cleaned)) as stage:
+            df_cleaned, cube = filtered_view(cache_key, selected, date_range, df_cleaned, index)
+            stage['rows_out'] = len(df_cleaned)
+        if df_cleaned.empty:
+            st.warning("Không có dòng dữ liệu nào thoả mãn bộ lọc.")
+            return
+        average_delivery_time = df_cleaned['Delivery Time'].mean()
+        cache_key = (*cache_key, tuple(selected.items()), date_range)
+
+    # Các phần phân tích: ở chế độ tải theo yêu cầu chỉ phần đang xem được tính toán
+    lazy_sections = st.sidebar.checkbox(
+        "Chỉ tính phần đang xem", value=True,
+        help="Tắt để hiển thị dạng tab, khi đó tất cả các tab đều được tính toán ở mỗi lần tải lại.")
+    large_data = st.sidebar.checkbox(
+        "Chế độ biểu đồ cho dữ liệu lớn", value=len(df_cleaned) > LARGE_DATA_ROWS,
+        help="Chỉ vẽ top thành phố (phần còn lại gộp vào 'Khác'), dùng WebGL và giới hạn số điểm cho chuỗi thời gian.")
+    if lazy_sections:
+        section = st.radio("Phần phân tích", SECTIONS, horizontal=True)
+        render_section(section, cache_key, selected_country, df_cleaned, cube, average_delivery_time,
+                       large_data, perf, comparison)
+    else:
+        for tab, section in zip(st.tabs(SECTIONS), SECTIONS):
+            with tab:
+                render_section(section, cache_key, selected_country, df_cleaned, cube, average_delivery_time,
+                               large_data, perf, comparison)
 
-def update_postal_codes(df, postal_codes):
-    def get_postal_code(city):
-        return postal_codes.get(city, '').split('-')[0]
 
-    df['Postal Code'] = df['City'].apply(get_postal_code)
-    return df
+DATA_SOURCES = ["File upload", "Dataset đã chia sẻ", "Dataset tích luỹ"]
 
 st.title("Phân tích dữ liệu thị trường")
 st.write("Upload file dữ liệu (.csv hoặc .xlsx) và chọn quốc gia để phân tích.")
 
-# Upload file
-uploaded_file = st.file_uploader("Upload file dữ liệu", type=['csv', 'xlsx'])
-if uploaded_file:
-    # Load dữ liệu
-    df = load_data(uploaded_file)
-
-    # Kiểm tra nếu có cột 'Country'
-    if "Country" in df.columns:
-        countries = df["Country"].dropna().unique()
-        selected_country = st.selectbox("Chọn quốc gia", sorted(countries))
-
-        # Lọc dữ liệu theo quốc gia
-        df_cleaned = df[df["Country"] == selected_country].copy()
-
-        # Tiền xử lý dữ liệu
-        df_cleaned.drop_duplicates(inplace=True)
-        df_cleaned.fillna(method='ffill', inplace=True)
-
-        # Xử lý dữ liệu thời gian
-        df_cleaned['Order Date'] = pd.to_datetime(df_cleaned['Order Date'], errors='coerce')
-        df_cleaned['Ship Date'] = pd.to_datetime(df_cleaned['Ship Date'], errors='coerce')
-
-        # Kiểm tra nếu có giá trị NaT (Not a Time)
-        if df_cleaned['Order Date'].isnull().sum() > 0 or df_cleaned['Ship Date'].isnull().sum() > 0:
-            st.warning(
-                f"Có {df_cleaned['Order Date'].isnull().sum()} giá trị không hợp lệ trong 'Order Date' và {df_cleaned['Ship Date'].isnull().sum()} giá trị không hợp lệ trong 'Ship Date'.")
-
-        # Tính khoảng thời gian giao hàng
-        df_cleaned['Delivery Time'] = (df_cleaned['Ship Date'] - df_cleaned['Order Date']).dt.days
-        average_delivery_time = df_cleaned['Delivery Time'].mean()
-
-        # Xử lý ngoại lai bằng trung vị
-        numeric_cols = ['Sales', 'Quantity', 'Discount', 'Profit', 'Shipping Cost']
-        df_cleaned = df_cleaned.copy()
-
-        for col in numeric_cols:
-            if col in df_cleaned.columns:
-                Q1 = df_cleaned[col].quantile(0.25)
-                Q3 = df_cleaned[col].quantile(0.75)
-                IQR = Q3 - Q1
-                lower_bound = Q1 - 1.5 * IQR
-                upper_bound = Q3 + 1.5 * IQR
-                median_value = df_cleaned[col].median()
-                df_cleaned[col] = df_cleaned[col].apply(
-                    lambda x: median_value if x < lower_bound or x > upper_bound else x)
-
-        # Cập nhật mã bưu chính
-        postal_codes = {
-            "Berlin": "10115-14199",
-            "Leipzig": "04103-04357",
-            "Munster": "48143-48167",
-            "Celle": "29221-29229",
-            "Duisburg": "47051-47279",
-            "Krefeld": "47798-47839",
-            "Augsburg": "86150-86199",
-            "Hanover": "30159-30669",
-            "Bremen": "28195-28779",
-            "Bochum": "44787-44894",
-            "Hamburg": "20095-21149, 22041",
-            "Moers": "47441-47447",
-            "Iserlohn": "58636-58644",
-            "Weimar": "99423-99427",
-            "Erlangen": "91052-91058",
-            "Regensburg": "93047-93059",
-            "Garbsen": "30823-30827",
-            "Menden": "58706-58710",
-            "Wetzlar": "35578-35586",
-            "Nuremberg": "90402-90491",
-            "Dortmund": "44135-44388",
-            "Schwerin": "19053-19061",
-            "Herford": "32049-32052",
-            "Munich": "80331-81929",
-            "Euskirchen": "53879-53881",
-            "Frankfurt": "60306-60599, 65929-65936",
-            "Trier": "54290-54296",
-            "Stuttgart": "70173-70629",
-            "Reutlingen": "72760-72770",
-            "Rostock": "18055-18147",
-            "Aachen": "52062-52080",
-            "Dormagen": "41539-41542",
-            "Mainz": "55116-55131",
-            "Gronau": "48599",
-            "Solingen": "42651-42719",
-            "Cologne": "50667-51149",
-            "Bottrop": "46236-46244",
-            "Ulm": "89073-89081",
-            "Castrop-Rauxel": "44575-44581",
-            "Bonn": "53111-53229",
-            "Herne": "44623-44653",
-            "Oberhausen": "46045-46149",
-            "Stolberg": "52222-52224",
-            "Jena": "07743-07751",
-            "Hildesheim": "31134-31141",
-            "Wilhelmshaven": "26382-26389",
-            "Kassel": "34117-34134",
-            "Sindelfingen": "71063-71069",
-            "Essen": "45127-45359",
-            "Bielefeld": "33602-33739",
-            "Langenhagen": "30851-30855",
-            "Offenburg": "77652-77656",
-            "Hamm": "59063-59077",
-            "Remscheid": "42853-42899",
-            "Brandenburg": "14770-14776",
-            "Halle": "06108-06132",
-            "Dresden": "01067-01328",
-            "Aschaffenburg": "63739-63743",
-            "Neuwied": "56564-56567",
-            "Oldenburg": "26121-26135",
-            "Ludwigshafen am Rhein": "67059-67071",
-            "Troisdorf": "53840-53844",
-            "Langen": "63225",
-            "Pforzheim": "75172-75181",
-            "Siegen": "57072-57080",
-            "Gera": "07545-07557",
-            "Potsdam": "14467-14482",
-            "Neunkirchen": "66538-66540",
-            "Aalen": "73430-73434",
-            "Greifswald": "17489-17493",
-            "Wiesbaden": "65183-65207",
-            "Magdeburg": "39104-39130",
-            "Erftstadt": "50374",
-            "Lippstadt": "59555-59558",
-            "Pulheim": "50259",
-            "Offenbach": "63065-63075",
-            "Kiel": "24103-24159",
-            "Kaiserslautern": "67655-67663",
-            "Rosenheim": "83022-83026",
-            "Worms": "67547-67551",
-            "Darmstadt": "64283-64297",
-            "Minden": "32423-32429",
-            "Herten": "45699-45701",
-            "Ratingen": "40878-40885",
-            "Paderborn": "33098-33106",
-            "Wuppertal": "42103-42399",
-            "Bayreuth": "95444-95448",
-            "Ludwigsfelde": "14974",
-            "Delmenhorst": "27749-27755",
-            "Emden": "26721-26725",
-            "Karlsruhe": "76131-76229",
-            "Grevenbroich": "41515-41517",
-            "Cottbus": "03042-03055",
-            "Rheine": "48429-48432",
-            "Heidelberg": "69115-69126",
-            "Ingolstadt": "85049-85057",
-            "Stralsund": "18435-18439",
-            "Gelsenkirchen": "45879-45899",
-            "Dorsten": "46282-46286",
-            "Norderstedt": "22844-22851",
-            "Chemnitz": "09111-09247",
-            "Koblenz": "56068-56077",
-            "Hagen": "58089-58135",
-            "Heilbronn": "74072-74081",
-            "Erfurt": "99084-99099",
-            "Friedrichshafen": "88045-88048",
-            "Marl": "45768-45772",
-            "Villingen-Schwenningen": "78048-78056",
-            "Recklinghausen": "45657-45665",
-            "Friedberg": "61169",
-            "Ludwigsburg": "71634-71642",
-            "Lohne": "49393",
-            "Unna": "59423-59427",
-            "Wetter (Ruhr)": "58300",
-            "Naumburg": "06618",
-            "Dinslaken": "46535-46539",
-            "Gummersbach": "51643-51647",
-            "Langenfeld": "40764",
-            "Freiburg": "79098-79117",
-            "Bremerhaven": "27568-27580",
-            "Gladbeck": "45964-45968",
-            "Witten": "58452-58456",
-            "Cuxhaven": "27472-27478",
-            "Arnsberg": "59755-59823",
-            "Leverkusen": "51371-51381",
-            "Velbert": "42549-42555",
-            "Eggenstein-Leopoldshafen": "76344",
-            "Hilden": "40721",
-            "Viersen": "41747-41751",
-            "Neu-Ulm": "89231-89233",
-            "Neubrandenburg": "17033-17036",
-            "Bergheim": "50126-50129",
-            "Bad Waldsee": "88339",
-            "Bergisch Gladbach": "51427-51469",
-            "Wolfsburg": "38440-38448",
-            "Waiblingen": "71332-71336",
-            "Bamberg": "96047-96052",
-            "Mannheim": "68159-68309",
-            "Ennigerloh": "59320",
-            "Sonneberg": "96515",
-            "Passau": "94032-94036",
-            "Willich": "47877",
-            "Kerpen": "50169-50171",
-            "Flensburg": "24937-24944",
-            "Baden-Baden": "76530-76534",
-            "Fulda": "36037-36043",
-            "Borken": "46325",
-            "Schweinfurt": "97421-97424",
-            "Hattingen": "45525-45527",
-            "Schiffweiler": "66578",
-            "Forst": "03149",
-            "Zwickau": "08056-08066",
-            "Detmold": "32756-32760",
-            "Günzburg": "89312",
-            "Stadtlohn": "48703"
-        }
-        df_cleaned = update_postal_codes(df_cleaned, postal_codes)
-
-        st.write("Dữ liệu đã tải lên:")
-        st.dataframe(df.head())
-        # Hiển thị dữ liệu đã lọc và xử lý
-        st.write("Dữ liệu đã lọc và xử lý: ")
-        st.dataframe(df_cleaned.head())
-
-        # Lưu dữ liệu đã xử lý vào file CSV
-        if st.button("Lưu dữ liệu đã xử lý"):
-            df_cleaned.to_csv(f'Updated_{selected_country}_data.csv', index=False)
-            st.success(f"Dữ liệu đã được lưu vào file 'Updated_{selected_country}_data.csv'")
-
-        # Tabs cho từng phần phân tích
-        tab1, tab2, tab3,tab4=st.tabs(
-            ["Tổng quan dữ liệu", "Trực quan hóa", "Phân tích dữ liệu",'Insight và Giải pháp'])
-
-        # 2. Tổng quan dữ liệu
-        with tab1:
-            st.subheader(f"Tổng quan dữ liệu - {selected_country}")
-            total_orders = len(df_cleaned)
-            total_sales = df_cleaned['Sales'].sum()
-            total_customers = df_cleaned['Customer ID'].nunique()
-            total_profit = df_cleaned['Profit'].sum()
-
-            st.write(f"**Số lượng đơn hàng**: {total_orders}")
-            st.write(f"**Tổng doanh số**: ${total_sales:,.2f}")
-            st.write(f"**Tổng lợi nhuận**: ${total_profit:,.2f}")
-            st.write(f"**Số lượng khách hàng**: {total_customers}")
-            st.write(f"**Thời gian giao hàng trung bình**: {average_delivery_time:.2f} ngày")
-
-            st.subheader("Doanh số và lợi nhuận theo phân khúc khách hàng")
-
-            # Grouping and aggregating data
-            segment_analysis = df_cleaned.groupby('Segment').agg(
-                total_sales=('Sales', 'sum'),
-                total_profit=('Profit', 'sum'),
-                total_orders=('Order ID', 'count')
-            ).reset_index()
-
-            # Format numbers for better readability
-            segment_analysis['total_sales'] = segment_analysis['total_sales'].map('{:,.2f}'.format)
-            segment_analysis['total_profit'] = segment_analysis['total_profit'].map('{:,.2f}'.format)
-            segment_analysis['total_orders'] = segment_analysis['total_orders'].map('{:,}'.format)
-
-            # Rename columns for display
-            segment_analysis = segment_analysis.rename(columns={
-                "total_sales": "Tổng doanh số",
-                "total_profit": "Tổng lợi nhuận",
-                "total_orders": "Tổng số đơn hàng"
-            })
-
-            st.dataframe(segment_analysis)
-
-            st.subheader("Phân tích theo phân khúc vận chuyển")
-
-            # Grouping and aggregating data for shipping analysis
-            shipping_analysis = df_cleaned.groupby('Ship Mode').agg(
-                total_orders=('Order ID', 'count'),
-                avg_shipping_cost=('Shipping Cost', 'mean'),
-                avg_profit=('Profit', 'mean')
-            ).reset_index()
-
-            # Format numbers for better readability
-            shipping_analysis['avg_shipping_cost'] = shipping_analysis['avg_shipping_cost'].map('{:,.2f}'.format)
-            shipping_analysis['avg_profit'] = shipping_analysis['avg_profit'].map('{:,.2f}'.format)
-            shipping_analysis['total_orders'] = shipping_analysis['total_orders'].map('{:,}'.format)
-
-            # Rename columns for display
-            shipping_analysis = shipping_analysis.rename(columns={
-                "total_orders": "Tổng số đơn hàng",
-                "avg_shipping_cost": "Chi phí vận chuyển trung bình",
-                "avg_profit": "Lợi nhuận trung bình"
-            })
-            st.dataframe(shipping_analysis)
-
-            st.subheader("Phân tích theo thứ tự ưu tiên")
-
-            # Grouping and aggregating data for order priority
-            priority_analysis = df_cleaned.groupby('Order Priority').agg(
-                total_orders=('Order ID', 'count'),
-                avg_shipping_cost=('Shipping Cost', 'mean'),
-                avg_profit=('Profit', 'mean')
-            ).reset_index()
-
-            # Format numbers for better readability
-            priority_analysis['avg_shipping_cost'] = priority_analysis['avg_shipping_cost'].map('{:,.2f}'.format)
-            priority_analysis['avg_profit'] = priority_analysis['avg_profit'].map('{:,.2f}'.format)
-            priority_analysis['total_orders'] = priority_analysis['total_orders'].map('{:,}'.format)
-
-            # Rename columns for display
-            priority_analysis = priority_analysis.rename(columns={
-                "total_orders": "Số lượng đơn hàng",
-                "avg_shipping_cost": "Chi phí vận chuyển trung bình",
-                "avg_profit": "Lợi nhuận trung bình"
-            })
-            st.dataframe(priority_analysis)
-
-            st.subheader("Phân tích theo danh mục con (Sub-Category)")
-
-            # Grouping and aggregating data
-            sub_analysis = df_cleaned.groupby('Sub-Category').agg(
-                total_sales=('Sales', 'sum'),
-                total_profit=('Profit', 'sum'),
-                total_orders=('Order ID', 'count')
-            ).reset_index()
-
-            # Format numbers for better readability
-            sub_analysis['total_sales'] = sub_analysis['total_sales'].map('{:,.2f}'.format)
-            sub_analysis['total_profit'] = sub_analysis['total_profit'].map('{:,.2f}'.format)
-            sub_analysis['total_orders'] = sub_analysis['total_orders'].map('{:,}'.format)
-
-            # Rename columns for display
-            sub_analysis = sub_analysis.rename(columns={
-                "total_sales": "Tổng doanh số",
-                "total_profit": "Tổng lợi nhuận",
-                "total_orders": "Tổng số đơn hàng"
-            })
-
-            st.dataframe(sub_analysis)
-
-        # 3. Trực quan hóa dữ liệu
-        with tab2:
-            st.subheader(f"Trực quan hóa dữ liệu - {selected_country}")
-
-            # Xu hướng doanh số theo thời gian
-            sales_trend = df_cleaned.groupby(pd.Grouper(key='Order Date', freq='M'))[
-                ['Sales', 'Profit', 'Quantity']].sum()
-
-            fig1 = go.Figure()
-
-            fig1.add_trace(go.Scatter(
-                x=sales_trend.index,
-                y=sales_trend['Sales'],
-                mode='lines',
-                name='Sales',
-                line=dict(color='dodgerblue', width=2)
-            ))
-
-            fig1.add_trace(go.Scatter(
-                x=sales_trend.index,
-                y=sales_trend['Profit'],
-                mode='lines',
-                name='Profit',
-                line=dict(color='coral', width=2)
-            ))
-
-            fig1.update_layout(
-                title=dict(text="Biểu đồ thể hiện doanh thu theo tháng và xu hướng lợi nhuận", font=dict(size=20, color='white')),
-                xaxis=dict(
-                    title="Tháng",
-                    tickformat='%b %Y',
-                    tickfont=dict(size=12, color='white'),
-                    showgrid=True
-                ),
-                yaxis=dict(
-                    title="Giá trị",
-                    tickfont=dict(size=12, color='white'),
-                    showgrid=True
-                ),
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1,
-                    font=dict(size=12, color='white')
-                ),
-                template="plotly_dark",
-                margin=dict(l=40, r=40, t=60, b=50)
-            )
-
-            st.plotly_chart(fig1)
-
-            city_sales = df_cleaned.groupby('City')[['Sales', 'Profit']].sum().sort_values(by='Sales',
-                                                                                             ascending=False)
-            fig2 = px.bar(city_sales, x=city_sales.index, y=['Sales','Profit'], title="Doanh số và lợi nhuận theo thành phố",
-                          barmode='group',color_discrete_map={'Sales':'deepskyblue','Profit':'wheat'},labels={'value':'Giá trị','variable':'Phân loại'})
-            st.plotly_chart(fig2)
-
-            category_profit = df_cleaned.groupby('Category')['Profit'].sum()
-            fig3 = px.pie(category_profit, values='Profit', names=category_profit.index,
-                          title="Lợi nhuận theo danh mục sản phẩm")
-            st.plotly_chart(fig3)
-
-            # So sánh doanh số giữa các danh mục sản phẩm
-            category_sales = df_cleaned.groupby('Category')['Sales'].sum()
-            fig4 = px.pie(category_sales, values='Sales', names=category_sales.index,
-                          title="Doanh số theo danh mục sản phẩm")
-            st.plotly_chart(fig4)
-
-            category_segment_data = df_cleaned.groupby(["Country", "Category", "Segment"])[
-                ["Sales", "Profit"]].sum().reset_index()
-
-            st.title("So sánh hiệu quả kinh doanh quốc gia theo phân khúc khách hàng")
-
-            cleaned_data = category_segment_data[category_segment_data["Country"] == selected_country]
-
-            fig5 = px.bar(
-                cleaned_data,
-                x="Category",
-                y="Sales",
-                color="Segment",
-                barmode="group",
-                text_auto=".2s",
-                title=f"Tổng Doanh Thu theo phân khúc khách hàng tại {selected_country}",
-                labels={"Sales": "Doanh Thu", "Category": "Danh mục sản phẩm", "Segment": "Phân khúc"},
-            )
-
-            fig6 = px.line(
-                cleaned_data,
-                x="Category",
-                y="Profit",
-                color="Segment",
-                markers=True,
-                title=f"Tổng Lợi Nhuận theo phân khúc khách hàng tại {selected_country}",
-                labels={"Profit": "Lợi nhuận", "Category": "Danh mục sản phẩm", "Segment": "Phân khúc"},
-            )
-
-            st.plotly_chart(fig5, use_container_width=True)
-            st.plotly_chart(fig6, use_container_width=True)
-
-        with tab3:
-            st.subheader(f"Phân tích dữ liệu - {selected_country}")
-
-            ship_mode_analysis = df_cleaned.groupby('Ship Mode')[['Sales', 'Profit']].sum()
-            fig7 = px.bar(ship_mode_analysis, x=ship_mode_analysis.index, y=['Sales','Profit'],
-                          title="Doanh thu và lợi nhuận theo trạng thái vận chuyển",barmode='group',labels={'value':'Giá trị','variable':'Phân loại'},color_discrete_map={'Sales':'dodgerblue','Profit':'powderblue'})
-            st.plotly_chart(fig7)
-
-            order_priority_analysis = df_cleaned.groupby('Order Priority')[['Sales', 'Profit']].sum()
-            fig8 = px.bar(order_priority_analysis, x=order_priority_analysis.index, y=['Sales','Profit'],
-                          title="Doanh thu và lợi nhuận theo thứ tự ưu tiên đơn hàng",barmode='group',labels={'value':'Giá trị','variable':'Phân loại'},color_discrete_map={'Sales':'dodgerblue','Profit':'powderblue'})
-            st.plotly_chart(fig8)
-        with tab4:
-            st.subheader('Insight:')
-            st.write("- Consumer là nhóm khách hàng chủ lực, đóng góp lớn nhất vào doanh số, lợi nhuận và số lượng đơn hàng.")
-            st.write("- Tỷ suất lợi nhuận của Consumer (14.75%) thấp hơn 2 nhóm còn lại do chi phí marketing, bán hàng, vận hành hoặc chiết khấu cao hơn.")
-            st.write("- Corporate (15.36%) và Home Office (16.07%) có tỷ suất lợi nhuận tốt, cho thấy tiềm năng phát triển trong tương lai.")
-            st.write("- Standard Class là phương thức vận chuyển chủ lực với số lượng đơn hàng cao nhất (1,307) và lợi nhuận trung bình cao nhất (26.44), nhờ chi phí thấp và thời gian giao hàng phù hợp.")
-            st.write("- Same Day có lợi nhuận trung bình cao thứ hai nhưng số lượng đơn thấp nhất (108), có thể do giá cao, marketing chưa hiệu quả hoặc giới hạn dịch vụ.")
-            st.write("- First Class và Second Class cần xem xét lại về giá, dịch vụ hoặc marketing để tăng tính cạnh tranh và thu hút khách hàng.")
-            st.write("- Nhóm Medium có số lượng đơn hàng cao nhất (1,223) và chi phí vận chuyển trung bình thấp nhất (14.14), cho thấy đang mang lại hiệu quả cao nhất cho doanh nghiệp.")
-            st.write("- Art có lợi nhuận cao nhất (8,683.43), trong khi Tables có doanh số (4,919.04) và lợi nhuận (600.15) thấp, cho thấy danh mục Tables có thể không hiệu quả về kinh doanh.")
-            st.write("- Doanh thu tăng qua các năm, đạt đỉnh vào tháng 8/2014 (17.95185k), do ngành bán lẻ trực tuyến phát triển nhờ internet, niềm tin người tiêu dùng và thương mại điện tử")
-            st.write("- Office Supplies dẫn đầu về doanh số (45.9%) và lợi nhuận (53.7%), điều này cho thấy đây là một ngành hàng có biên lợi nhuận cao và đáng được đầu tư, mở rộng hơn nữa.")
-            st.subheader('Giải pháp:')
-            st.write("- Tăng doanh thu cho các danh mục có biên lợi nhuận cao.")
-            st.write("- Giảm thiểu danh mục có doanh thu thấp, lợi nhuận thấp.")
-            st.write("- Phân tích xu hướng mua hàng, đánh giá xem danh mục nào có tiềm năng tăng trưởng.")
-            st.write("- Thử nghiệm chiến dịch tiếp thị trong 3-6 tháng để đo lường hiệu quả của việc tập trung vào danh mục có lợi nhuận cao.")
-            st.write("- Xem xét dữ liệu bán hàng theo quý, nếu danh mục không cải thiện, cân nhắc thay thế bằng sản phẩm khác.")
-            st.write("- Tối ưu chi phí để tăng lợi nhuận.")
-            st.write("- Ổn định doanh thu để giảm rủi ro.")
-            st.write("- Tăng lợi nhuận bằng cách cải thiện biên lợi nhuận.")
-            st.write("- Dự báo và lập kế hoạch tài chính.")
-
+# Đo hiệu năng từng bước (tuỳ chọn), báo cáo profile chỉ chạy cho một lần tải lại khi được yêu cầu
+show_perf = st.sidebar.checkbox("Hiển thị bảng hiệu năng")
+perf = PerfRecorder(enabled=show_perf or PERF_LOG_ENABLED, track_memory=show_perf)
+profiler_kind = st.session_state.pop('profile_next_run', None)
+profiler = start_profiler(profiler_kind) if profiler_kind else None
+# Báo cáo được ghi vào một dict có sẵn trong session_state: sau st.stop() mọi lệnh st, kể cả gán vào
+# session_state, đều dừng lần chạy nên không gán trực tiếp được
+profile_reports = st.session_state.setdefault('profile_reports', {})
+
+# Mọi lối ra của lần chạy (kể cả st.stop() khi chờ job nền, st.rerun() hay lỗi) đều dừng profiler
+try:
+    # Nguồn dữ liệu: file upload, dataset đã được phiên khác upload, hoặc dataset tích luỹ qua các lần nối thêm
+    source = st.sidebar.radio("Nguồn dữ liệu", DATA_SOURCES)
+    # Bộ máy tính các bảng tổng hợp (chỉ hiện khi cài thêm duckdb hoặc polars)
+    backend = 'pandas'
+    if len(QUERY_BACKENDS) > 1:
+        backend = st.sidebar.selectbox(
+            "Bộ máy truy vấn", QUERY_BACKENDS,
+            help="DuckDB/Polars chạy trên file đã lưu (kho Arrow, dataset tích luỹ); bảng chỉ có trong bộ nhớ "
+                 "như dữ liệu sau bộ lọc luôn dùng pandas.")
+
+    # Upload file hoặc mở dataset đã chia sẻ theo tên
+    uploaded_file = st.file_uploader("Upload file dữ liệu", type=['csv', 'xlsx']) if source == DATA_SOURCES[0] else None
+    shared_name = None
+    if source == DATA_SOURCES[1] and list_shared():
+        shared_name = st.selectbox("Chọn dataset đã chia sẻ", list_shared())
+    if uploaded_file or shared_name:
+        streaming = bool(uploaded_file) and st.sidebar.checkbox(
+            "Đọc theo luồng (file lớn)",
+            help="Đọc file theo từng chunk và chỉ giữ lại dữ liệu của quốc gia được chọn.")
+        # Xử lý nền: đọc và làm sạch chạy trong luồng riêng, không bị huỷ khi trang tải lại
+        background = not streaming and st.sidebar.checkbox(
+            "Xử lý nền", value=bool(uploaded_file) and uploaded_file.size > BACKGROUND_MIN_BYTES,
+            help="Đọc và làm sạch dữ liệu ở luồng nền, hiển thị tiến độ từng bước và phần dữ liệu đã sẵn sàng.")
+        if uploaded_file:
+            # Băm nội dung một lần cho mỗi file upload, các lần tải lại sau dùng lại theo file_id
+            fingerprints = st.session_state.setdefault('upload_fingerprints', {})
+            if uploaded_file.file_id not in fingerprints:
+                fingerprints[uploaded_file.file_id] = dataset_fingerprint(uploaded_file.getvalue())
+            fingerprint = fingerprints[uploaded_file.file_id]
+        else:
+            fingerprint = load_registry()[shared_name]['fingerprint']
+
+        # Cột chi tiết ngoài schema chỉ có trong file upload, được đọc khi người dùng muốn xem
+        load_detail = (lambda: load_preview(fingerprint, uploaded_file)) if uploaded_file else None
+
+        if background and not has_frame(fingerprint):
+            # Chỉ sao chép file upload khi thật sự tạo job mới; trong lúc job chạy các lần tải lại chỉ đọc tiến độ
+            job = get_job(('load', fingerprint))
+            if job is None or job.status == 'error':
+                job = submit(('load', fingerprint), "Đọc dữ liệu", LOAD_STAGES, load_job, fingerprint,
+                             detach_upload(uploaded_file))
+            if not job.done:
+                render_job_progress(job)
+                st.stop()
+            if job.status == 'error':
+                st.error(f"Đọc dữ liệu thất bại: {job.error}")
+                st.stop()
+
+        # Load dữ liệu
+        if streaming:
+            columns = read_columns(uploaded_file)
+        else:
+            with perf.stage('load_data') as stage:
+                df = load_data(fingerprint, uploaded_file)
+                stage['rows_out'] = len(df)
+            columns = df.columns
+
+        # Kiểm tra nếu có cột 'Country'
+        if "Country" in columns:
+            if streaming:
+                countries = stream_countries(fingerprint, uploaded_file)
+            else:
+                countries = df["Country"].dropna().unique()
+            selected_country = st.selectbox("Chọn quốc gia", sorted(countries))
+            if streaming:
+                with perf.stage('load_data/stream_country') as stage:
+                    df = stream_country(fingerprint, selected_country, uploaded_file)
+                    stage['rows_out'] = len(df)
+
+            # Tuỳ chọn tiền xử lý
+            outlier_method = st.sidebar.selectbox(
+                "Phương pháp xử lý ngoại lai", list(OUTLIER_METHODS), format_func=OUTLIER_METHODS.get)
+            options = {**DEFAULT_OPTIONS, 'outlier_method': outlier_method}
+
+            # Ở chế độ nền, trong lúc làm sạch vẫn hiển thị ngay dữ liệu gốc đã đọc xong
+            if background and not has_frame(frame_key(fingerprint, selected_country, options)):
+                job = submit(('clean', fingerprint, selected_country, repr(options)), f"Làm sạch dữ liệu {selected_country}",
+                             CLEAN_STAGES, clean_job, fingerprint, selected_country, options, df)
+                if not job.done:
+                    render_raw_preview(df, load_detail)
+                    render_job_progress(job)
+                    st.stop()
+                if job.status == 'error':
+                    st.error(f"Làm sạch dữ liệu thất bại: {job.error}")
+                    st.stop()
+
+            # Tiền xử lý dữ liệu (được cache, chỉ chạy lại khi đổi file, quốc gia hoặc tuỳ chọn)
+            row_hashes = None
+            if options['drop_duplicates'] and not streaming:
+                with perf.stage('row_hash_index', rows_in=len(df)):
+                    row_hashes = row_hash_index(fingerprint, options['dedup_keys'], df)
+            with perf.stage('preprocess', rows_in=len(df)) as stage:
+                df_cleaned, info = preprocess(fingerprint, selected_country, options, df, perf, row_hashes)
+                stage['rows_out'] = len(df_cleaned)
+
+            # Kiểm tra nếu có giá trị NaT (Not a Time)
+            if info['nat_order_date'] > 0 or info['nat_ship_date'] > 0:
+                st.warning(
+                    f"Có {info['nat_order_date']} giá trị không hợp lệ trong 'Order Date' và {info['nat_ship_date']} giá trị không hợp lệ trong 'Ship Date'.")
+
+            average_delivery_time = info['average_delivery_time']
+            with perf.stage('aggregate_cube', rows_in=len(df_cleaned)) as stage:
+                cube = aggregate_cube(fingerprint, selected_country, options, backend, df_cleaned)
+                stage['rows_out'] = cube_size(cube)
+
+            render_raw_preview(df, load_detail)
+            # Hiển thị dữ liệu đã lọc và xử lý
+            st.write("Dữ liệu đã lọc và xử lý: ")
+            st.dataframe(df_cleaned.head())
+
+            # Lưu dữ liệu đã xử lý vào file CSV (làm sạch lại trên đủ các cột của file)
+            if st.button("Lưu dữ liệu đã xử lý"):
+                df_export = export_data(fingerprint, selected_country, options, uploaded_file)
+                df_export = df_cleaned if df_export is None else df_export
+                df_export.to_csv(f'Updated_{selected_country}_data.csv', index=False)
+                st.success(f"Dữ liệu đã được lưu vào file 'Updated_{selected_country}_data.csv'")
+
+            # Nối file đang xem vào dataset tích luỹ: chỉ các dòng mới được làm sạch và cộng vào tổng hợp
+            with st.sidebar.expander("Nối thêm vào dataset tích luỹ"):
+                dataset_name = st.text_input("Tên dataset", value="superstore")
+                if st.button("Nối thêm file này"):
+                    # Tên dataset là tên thư mục trên đĩa nên được kiểm tra trước khi ghi
+                    if not valid_dataset_name(dataset_name):
+                        st.error("Tên dataset chỉ được gồm chữ, số, '_' và '-'.")
+                    else:
+                        try:
+                            with st.spinner("Đang nối thêm dữ liệu..."):
+                                full_df = read_full(fingerprint, uploaded_file)
+                                summary = append_dataset(dataset_name, df if full_df is None else full_df, options,
+                                                         perf)
+                            st.success(f"Đã thêm {summary['rows_new']} dòng mới, bỏ qua {summary['rows_skipped']} "
+                                       f"dòng đã có ({summary['seconds']}s).")
+                        except ValueError as e:
+                            st.error(str(e))
+
+            # Phần so sánh quốc gia cần toàn bộ dữ liệu nên không có ở chế độ đọc theo luồng
+            comparison = None if streaming else lambda: compare_countries(fingerprint, options, df, row_hashes)
+            render_dashboard((fingerprint, selected_country, options), selected_country, df_cleaned, cube,
+                             average_delivery_time, perf, comparison)
+
+        else:
+            st.error("File dữ liệu không có cột 'Country'. Vui lòng kiểm tra lại.")
+    elif source == DATA_SOURCES[0]:
+        st.info("Vui lòng upload file dữ liệu để tiếp tục.")
+    elif source == DATA_SOURCES[1]:
+        st.info("Chưa có dataset nào được chia sẻ. Dataset được đăng ký tự động khi upload file.")
     else:
-        st.error("File dữ liệu không có cột 'Country'. Vui lòng kiểm tra lại.")
-else:
-    st.info("Vui lòng upload file dữ liệu để tiếp tục.")
+        datasets = list_datasets()
+        if datasets:
+            dataset_name = st.selectbox("Chọn dataset", datasets)
+            state = load_state(dataset_name)
+            selected_country = st.selectbox("Chọn quốc gia", state['countries'])
+            # Số phần dữ liệu đóng vai trò phiên bản: mỗi lần nối thêm làm mới cache
+            version = len(state['parts'])
+            with perf.stage('load_dataset') as stage:
+                df_cleaned, cube = load_stored(dataset_name, version, selected_country, backend)
+                stage['rows_out'] = len(df_cleaned)
+            st.write(f"Dataset '{dataset_name}': {state['rows']} dòng sau {len(state['appends'])} lần nối thêm.")
+            st.dataframe(df_cleaned.head())
+            render_dashboard((dataset_name, version, selected_country), selected_country, df_cleaned, cube,
+                             df_cleaned['Delivery Time'].mean(), perf,
+                             lambda: compare_stored(dataset_name, version, backend))
+        else:
+            st.info("Chưa có dataset tích luỹ. Hãy upload file và dùng 'Nối thêm vào dataset tích luỹ'.")
+
+    # Bảng hiệu năng của lần tải lại này
+    if show_perf:
+        with st.sidebar.expander("Hiệu năng", expanded=True):
+            st.dataframe(perf.to_frame(), hide_index=True)
+            # Bộ đếm hit/miss/eviction và dung lượng của các cache
+            st.dataframe(cache_stats(), hide_index=True)
+            kind = st.selectbox("Công cụ profile", PROFILERS)
+            if st.button("Profile lần tải lại tiếp theo"):
+                st.session_state['profile_next_run'] = kind
+                st.rerun()
+finally:
+    if profiler is not None:
+        profile_reports['last'] = stop_profiler(profiler)
+
+if show_perf and 'last' in profile_reports:
+    with st.sidebar.expander("Báo cáo profile"):
+        st.download_button("Tải báo cáo", profile_reports['last'], file_name='profile.txt')
+        st.code(profile_reports['last'])
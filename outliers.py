@@ -0,0 +1,100 @@
+import pandas as pd
+
+OUTLIER_METHODS = {
+    'median': 'Thay bằng trung vị (IQR)',
+    'clip': 'Cắt về biên IQR',
+    'zscore': 'Z-score, thay bằng trung vị',
+}
+
+
+def bounds_from_stats(stats, method='median', k=1.5, z_threshold=3.0):
+    # stats: bảng có các cột q1, median, q3, mean, std, mỗi dòng là một cột dữ liệu
+    if method == 'zscore':
+        lower_bound = stats['mean'] - z_threshold * stats['std']
+        upper_bound = stats['mean'] + z_threshold * stats['std']
+    else:
+        IQR = stats['q3'] - stats['q1']
+        lower_bound = stats['q1'] - k * IQR
+        upper_bound = stats['q3'] + k * IQR
+    return lower_bound, upper_bound, stats['median']
+
+
+def outlier_bounds(values, method='median', k=1.5, z_threshold=3.0):
+    # Lấy Q1, trung vị, Q3 của tất cả các cột trong một lần gọi
+    quartiles = values.quantile([0.25, 0.5, 0.75])
+    stats = pd.DataFrame({'q1': quartiles.loc[0.25], 'median': quartiles.loc[0.5], 'q3': quartiles.loc[0.75]})
+    if method == 'zscore':
+        stats['mean'] = values.mean()
+        stats['std'] = values.std(ddof=0)
+    return bounds_from_stats(stats, method, k, z_threshold)
+
+
+def handle_outliers(df, cols, method='median', k=1.5, z_threshold=3.0, bounds=None):
+    # bounds: (lower, upper, median) tính sẵn, ví dụ từ sketch của toàn bộ lịch sử dữ liệu
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Phương pháp xử lý ngoại lai không hợp lệ: {method}")
+
+    cols = [col for col in cols if col in df.columns]
+    if not cols:
+        return df, {}
+
+    values = df[cols]
+    if bounds is None:
+        bounds = outlier_bounds(values, method, k, z_threshold)
+    lower_bound, upper_bound, median = (bound.reindex(cols) for bound in bounds)
+
+    # Mặt nạ ngoại lai cho toàn bộ các cột, NaN không bị coi là ngoại lai
+    mask = values.lt(lower_bound, axis=1) | values.gt(upper_bound, axis=1)
+    counts = {col: int(n) for col, n in mask.sum().items()}
+
+    if method == 'clip':
+        df[cols] = values.clip(lower_bound, upper_bound, axis=1)
+    else:
+        df[cols] = values.mask(mask, median, axis=1)
+    return df, counts
+
+
+def grouped_outlier_bounds(values, groups, method='median', k=1.5, z_threshold=3.0):
+    # Biên của từng nhóm (ví dụ từng quốc gia) trong một lượt groupby, mỗi biên là bảng nhóm x cột
+    grouped = values.groupby(groups, observed=True)
+    quartiles = grouped.quantile([0.25, 0.5, 0.75])
+    stats = {name: quartiles.xs(q, level=-1) for name, q in (('q1', 0.25), ('median', 0.5), ('q3', 0.75))}
+    if method == 'zscore':
+        stats['mean'] = grouped.mean()
+        stats['std'] = grouped.std(ddof=0)
+    return bounds_from_stats(stats, method, k, z_threshold)
+
+
+def handle_outliers_by(df, cols, by, method='median', k=1.5, z_threshold=3.0):
+    # Giống handle_outliers chạy riêng cho từng nhóm của cột 'by', nhưng chỉ quét dữ liệu một lần
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Phương pháp xử lý ngoại lai không hợp lệ: {method}")
+
+    cols = [col for col in cols if col in df.columns]
+    if not cols:
+        return df, {}
+
+    bounds = grouped_outlier_bounds(df[cols], df[by], method, k, z_threshold)
+    return apply_grouped_bounds(df, cols, by, bounds, method)
+
+
+def apply_grouped_bounds(df, cols, by, bounds, method='median'):
+    # bounds: (lower, upper, median), mỗi biên là bảng nhóm x cột; nhóm không có biên thì không bị thay đổi.
+    # Cột số nguyên chuyển sang float trước khi thay: biên/trung vị theo dòng là số thực (NaN với nhóm không có
+    # biên), pandas sẽ không còn tự ép kết quả về số nguyên
+    values = df[cols]
+    integer_cols = [col for col in cols if pd.api.types.is_integer_dtype(values[col])]
+    if integer_cols:
+        values = values.astype(dict.fromkeys(integer_cols, 'float64'))
+    # Trải biên của nhóm ra từng dòng để so sánh vector hoá trên toàn bảng
+    lower_bound, upper_bound, median = (bound.reindex(columns=cols).reindex(df[by]).to_numpy() for bound in bounds)
+
+    below, above = values.lt(lower_bound), values.gt(upper_bound)
+    mask = below | above
+    counts = {col: int(n) for col, n in mask.sum().items()}
+
+    if method == 'clip':
+        df[cols] = values.mask(below, lower_bound).mask(above, upper_bound)
+    else:
+        df[cols] = values.mask(mask, median)
+    return df, counts
@@ -0,0 +1,125 @@
+import hashlib
+
+from dates import parse_dates
+from dedup import drop_duplicate_rows
+from outliers import apply_grouped_bounds, bounds_from_stats, handle_outliers, handle_outliers_by
+from postal_index import resolve_postal_codes
+from profiling import NO_PERF
+from schema import optimize_dtypes
+from sketches import grouped_sketch_stats, sketch_stats, update_sketches
+
+NUMERIC_COLS = ['Sales', 'Quantity', 'Discount', 'Profit', 'Shipping Cost']
+
+DEFAULT_OPTIONS = {
+    'drop_duplicates': True,
+    # Cột dùng để nhận biết dòng trùng (None: toàn bộ các cột)
+    'dedup_keys': None,
+    'fill_method': 'ffill',
+    'numeric_cols': NUMERIC_COLS,
+    'outlier_method': 'median',
+}
+
+
+def dataset_fingerprint(data):
+    # Băm nội dung file upload để làm khóa cache, không phụ thuộc tên file
+    return hashlib.sha256(data).hexdigest()
+
+
+def update_postal_codes(df):
+    df['Postal Code'] = resolve_postal_codes(df['City'])
+    return df
+
+
+def clean_data(df, country, options=None, perf=NO_PERF, sketches=None, row_hashes=None):
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+
+    with perf.stage('clean/filter_dedup_fill', rows_in=len(df)) as stage:
+        # Lọc dữ liệu theo quốc gia (phép lọc đã tạo ra frame mới nên không cần .copy())
+        mask = (df["Country"] == country).to_numpy()
+        df_cleaned = df[mask]
+
+        # Tiền xử lý dữ liệu: loại dòng trùng theo băm 64-bit của dòng (dùng chỉ mục băm đã lưu nếu có)
+        if options['drop_duplicates']:
+            hashes = row_hashes[mask] if row_hashes is not None else None
+            df_cleaned = drop_duplicate_rows(df_cleaned, options['dedup_keys'], hashes)
+        if options['fill_method'] == 'ffill':
+            df_cleaned = df_cleaned.ffill()
+        stage['rows_out'] = len(df_cleaned)
+
+    with perf.stage('clean/dates', rows_in=len(df_cleaned)):
+        # Xử lý dữ liệu thời gian: dò định dạng một lần rồi phân tích vector hoá, tính luôn 'Delivery Time'
+        df_cleaned, date_formats, nat_counts = parse_dates(df_cleaned)
+
+    # Số giá trị NaT (Not a Time) để cảnh báo trên giao diện
+    info = {
+        'date_formats': date_formats,
+        'nat_order_date': nat_counts['Order Date'],
+        'nat_ship_date': nat_counts['Ship Date'],
+        'average_delivery_time': df_cleaned['Delivery Time'].mean(),
+    }
+
+    with perf.stage('clean/outliers', rows_in=len(df_cleaned)):
+        # Khi có sketch (chế độ nối thêm dữ liệu), biên ngoại lai được tính trên toàn bộ lịch sử đã gộp
+        bounds = None
+        if sketches is not None:
+            update_sketches(sketches, df_cleaned, options['numeric_cols'])
+            bounds = bounds_from_stats(sketch_stats(sketches, options['numeric_cols']), options['outlier_method'])
+
+        # Xử lý ngoại lai (mặc định: thay bằng trung vị theo IQR)
+        df_cleaned, info['outlier_counts'] = handle_outliers(
+            df_cleaned, options['numeric_cols'], options['outlier_method'], bounds=bounds)
+
+    with perf.stage('clean/postal_codes', rows_in=len(df_cleaned)):
+        # Cập nhật mã bưu chính
+        df_cleaned = update_postal_codes(df_cleaned)
+
+    with perf.stage('clean/optimize_dtypes', rows_in=len(df_cleaned)):
+        # Thu gọn kiểu dữ liệu của kết quả (category, số nhỏ hơn)
+        df_cleaned = optimize_dtypes(df_cleaned)
+    return df_cleaned, info
+
+
+def clean_all(df, options=None, perf=NO_PERF, row_hashes=None, sketches=None):
+    # Làm sạch mọi quốc gia trong một lượt: kết quả của mỗi quốc gia giống clean_data(df, country),
+    # các bước phụ thuộc quốc gia (điền giá trị thiếu, biên ngoại lai) được tính theo nhóm.
+    # sketches: {quốc gia: {cột: sketch}} của lịch sử dữ liệu (chế độ nối thêm), được cập nhật tại chỗ
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+
+    with perf.stage('clean_all/filter_dedup_fill', rows_in=len(df)) as stage:
+        mask = df['Country'].notna().to_numpy()
+        df_cleaned = df[mask]
+        if options['drop_duplicates']:
+            # Với tập cột khóa riêng, thêm 'Country' để chỉ loại trùng trong cùng một quốc gia như clean_data
+            if options['dedup_keys']:
+                df_cleaned = drop_duplicate_rows(df_cleaned, ['Country', *options['dedup_keys']])
+            else:
+                hashes = row_hashes[mask] if row_hashes is not None else None
+                df_cleaned = drop_duplicate_rows(df_cleaned, None, hashes)
+        if options['fill_method'] == 'ffill':
+            filled = df_cleaned.groupby('Country', observed=True, sort=False).ffill()
+            df_cleaned = filled.assign(Country=df_cleaned['Country'])[df_cleaned.columns]
+        stage['rows_out'] = len(df_cleaned)
+
+    with perf.stage('clean_all/dates', rows_in=len(df_cleaned)):
+        df_cleaned, _, _ = parse_dates(df_cleaned)
+
+    with perf.stage('clean_all/outliers', rows_in=len(df_cleaned)):
+        if sketches is None:
+            df_cleaned, _ = handle_outliers_by(df_cleaned, options['numeric_cols'], 'Country',
+                                               options['outlier_method'])
+        else:
+            # Biên của mỗi quốc gia lấy từ sketch đã gộp dữ liệu mới với toàn bộ lịch sử, như clean_data
+            cols = [col for col in options['numeric_cols'] if col in df_cleaned.columns]
+            for country, part in df_cleaned.groupby('Country', observed=True, sort=False):
+                update_sketches(sketches.setdefault(country, {}), part, cols)
+            stats = grouped_sketch_stats({country: sketches[country] for country in df_cleaned['Country'].unique()},
+                                         cols)
+            bounds = bounds_from_stats(stats, options['outlier_method'])
+            df_cleaned, _ = apply_grouped_bounds(df_cleaned, cols, 'Country', bounds, options['outlier_method'])
+
+    with perf.stage('clean_all/postal_codes', rows_in=len(df_cleaned)):
+        df_cleaned = update_postal_codes(df_cleaned)
+
+    with perf.stage('clean_all/optimize_dtypes', rows_in=len(df_cleaned)):
+        df_cleaned = optimize_dtypes(df_cleaned)
+    return df_cleaned
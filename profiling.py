@@ -0,0 +1,125 @@
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+logger = logging.getLogger('superstore.perf')
+
+# SUPERSTORE_PERF_LOG=1: luôn ghi log JSON cho từng bước, kể cả khi không mở bảng hiệu năng
+PERF_LOG_ENABLED = os.environ.get('SUPERSTORE_PERF_LOG') == '1'
+if PERF_LOG_ENABLED and not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+# tracemalloc là trạng thái chung của cả tiến trình: tại mỗi thời điểm chỉ một recorder (phiên hoặc job nền)
+# giữ khóa này và được bật/đặt lại đỉnh/tắt tracemalloc, các recorder khác bỏ qua phần đo bộ nhớ
+TRACE_LOCK = threading.Lock()
+
+PROFILERS = ['cProfile']
+try:
+    import pyinstrument
+    PROFILERS.append('pyinstrument')
+except ImportError:
+    pyinstrument = None
+
+
+class PerfRecorder:
+    # Ghi lại thời gian, số dòng vào/ra và mức tăng bộ nhớ đỉnh của từng bước trong một lần chạy lại
+    def __init__(self, enabled=True, track_memory=False):
+        self.enabled = enabled
+        self.track_memory = enabled and track_memory
+        self.records = []
+        self._stack = []
+        self._tracing = False
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        record = {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        if not self.enabled:
+            yield record
+            return
+
+        if self.track_memory and not self._stack:
+            self._start_tracing()
+        if self._tracing:
+            # Lưu đỉnh hiện tại cho các bước cha trước khi đặt lại đỉnh cho bước con
+            self._propagate_peak(tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            record['_base'] = tracemalloc.get_traced_memory()[0]
+            record['_peak'] = record['_base']
+        self._stack.append(record)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = round(time.perf_counter() - start, 6)
+            self._stack.pop()
+            if self._tracing:
+                peak = max(tracemalloc.get_traced_memory()[1], record.pop('_peak'))
+                record['peak_mb'] = round((peak - record.pop('_base')) / 1024 ** 2, 3)
+                self._propagate_peak(peak)
+                if not self._stack:
+                    self._stop_tracing()
+            elif self.track_memory:
+                record['peak_mb'] = None
+            self.records.append(record)
+            logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+    def _start_tracing(self):
+        # Chỉ đo bộ nhớ khi giữ được khóa và tracemalloc chưa do nơi khác bật; tracemalloc chạy trong
+        # suốt bước ngoài cùng rồi tắt ngay để không làm chậm các lần chạy lại và phiên khác
+        if not TRACE_LOCK.acquire(blocking=False):
+            return
+        if tracemalloc.is_tracing():
+            TRACE_LOCK.release()
+            return
+        tracemalloc.start()
+        self._tracing = True
+
+    def _stop_tracing(self):
+        tracemalloc.stop()
+        self._tracing = False
+        TRACE_LOCK.release()
+
+    def _propagate_peak(self, peak):
+        for parent in self._stack:
+            parent['_peak'] = max(parent['_peak'], peak)
+
+    def to_frame(self):
+        return pd.DataFrame(self.records)
+
+
+NO_PERF = PerfRecorder(enabled=False)
+
+
+def start_profiler(kind='cProfile'):
+    if kind == 'pyinstrument' and pyinstrument is not None:
+        profiler = pyinstrument.Profiler()
+    else:
+        profiler = cProfile.Profile()
+    if isinstance(profiler, cProfile.Profile):
+        profiler.enable()
+    else:
+        profiler.start()
+    return profiler
+
+
+def stop_profiler(profiler, limit=40):
+    # Trả về báo cáo dạng văn bản của lần chạy vừa đo
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+    profiler.stop()
+    return profiler.output_text(unicode=True, color=False)
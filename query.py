@@ -0,0 +1,134 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cube import CUBE_GRAINS, CUBE_MEASURES, build_cube, cube_grains, measure_names
+
+# Bộ máy truy vấn tuỳ chọn: chạy đa luồng và đẩy bộ lọc xuống lúc đọc Parquet; pandas luôn có sẵn
+QUERY_BACKENDS = ['pandas']
+try:
+    import duckdb
+    QUERY_BACKENDS.append('duckdb')
+except ImportError:
+    duckdb = None
+try:
+    import polars as pl
+    QUERY_BACKENDS.append('polars')
+except ImportError:
+    pl = None
+
+
+def _is_arrow(paths):
+    # File Arrow IPC của kho dùng chung (dataset_store), còn lại là các file Parquet
+    return all(str(path).endswith('.arrow') for path in paths)
+
+
+def _read_arrow(paths):
+    # Memory-map: DuckDB quét thẳng trên vùng nhớ được map, không sao chép dữ liệu
+    return pa.concat_tables([pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all() for path in paths])
+
+
+def _source_columns(paths):
+    if _is_arrow(paths):
+        return pa.ipc.open_file(pa.memory_map(str(paths[0]), 'r')).schema.names
+    return pq.read_schema(paths[0]).names
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _duckdb_cube(source, grains, country):
+    # Mọi độ chi tiết trong một truy vấn GROUPING SETS (một lượt quét); GROUPING() cho biết dòng thuộc bảng nào
+    dims = list(dict.fromkeys(dim for grain in grains for dim in grain))
+    select = []
+    for dim in dims:
+        if dim == 'Month':
+            select.append('CAST(date_trunc(\'month\', "Order Date") AS TIMESTAMP) AS "Month"')
+        else:
+            select.append(_quote(dim))
+    for col in CUBE_MEASURES:
+        # sum() của nhóm toàn NULL trả về NULL, pandas trả về 0
+        select.append(f'coalesce(sum({_quote(col)}), 0) AS {_quote(col + "_sum")}')
+        select.append(f'count({_quote(col)}) AS {_quote(col + "_count")}')
+    select.append('count("Order ID") AS "Order ID_count"')
+    select.append(f'GROUPING({", ".join(_quote(dim) for dim in dims)}) AS grouping_id')
+    sets = ', '.join('(' + ', '.join(_quote(dim) for dim in grain) + ')' for grain in grains)
+
+    con = duckdb.connect()
+    try:
+        params = []
+        if _is_arrow(source):
+            con.register('source', _read_arrow(source))
+            relation = 'source'
+        else:
+            relation = 'read_parquet(?)'
+            params.append(source)
+        where = ''
+        if country is not None:
+            where = ' WHERE "Country" = ?'
+            params.append(country)
+        sql = f'SELECT {", ".join(select)} FROM {relation}{where} GROUP BY GROUPING SETS ({sets})'
+        result = con.execute(sql, params).df()
+    finally:
+        con.close()
+
+    # Bit của GROUPING() bằng 1 với cột không tham gia nhóm, cột đầu tiên là bit cao nhất
+    cube = {}
+    for grain in grains:
+        grouping_id = sum(1 << (len(dims) - 1 - i) for i, dim in enumerate(dims) if dim not in grain)
+        cube[grain] = result.loc[result['grouping_id'] == grouping_id, [*grain, *measure_names()]]
+    return cube
+
+
+def _polars_cube(source, grains, country):
+    # Các group_by dùng chung một kế hoạch quét, collect_all chạy chúng song song
+    if _is_arrow(source):
+        frame = pl.scan_ipc(source)
+    else:
+        frame = pl.scan_parquet(source)
+    if country is not None:
+        frame = frame.filter(pl.col('Country').cast(pl.String) == country)
+    frame = frame.with_columns(pl.col('Order Date').dt.truncate('1mo').alias('Month'))
+    measures = []
+    for col in CUBE_MEASURES:
+        measures += [pl.col(col).sum().alias(f'{col}_sum'), pl.col(col).count().alias(f'{col}_count')]
+    measures.append(pl.col('Order ID').count().alias('Order ID_count'))
+    queries = [frame.group_by(list(grain)).agg(measures) if grain else frame.select(measures) for grain in grains]
+    # Cột chiều kiểu Categorical của Polars sang pandas giữ thứ tự xuất hiện đầu tiên làm thứ tự nhóm:
+    # chuyển về chuỗi để rollup sắp xếp theo chữ cái giống pandas và DuckDB
+    queries = [query.with_columns(pl.col(dim).cast(pl.String) for dim in grain if dim != 'Month')
+               for query, grain in zip(queries, grains)]
+    return {grain: result.to_pandas() for grain, result in zip(grains, pl.collect_all(queries))}
+
+
+def query_cube(source, backend='pandas', country=None, by=()):
+    # Tính cube bằng một truy vấn; source là DataFrame đã làm sạch hoặc danh sách file (Parquet hoặc Arrow
+    # của kho dùng chung). DuckDB/Polars chỉ chạy trên file (đọc lọc, memory-map); DataFrame đã nằm trong
+    # bộ nhớ luôn dùng pandas vì chuyển sang bộ máy khác chỉ tốn thêm một lần sao chép
+    if isinstance(source, pd.DataFrame):
+        if country is not None:
+            source = source[source['Country'] == country]
+        return build_cube(source, by)
+    source = [str(path) for path in source]
+    if backend == 'pandas':
+        if _is_arrow(source):
+            frame = _read_arrow(source).to_pandas()
+            return query_cube(frame, backend, country, by)
+        filters = [('Country', '==', country)] if country is not None else None
+        return build_cube(pd.read_parquet(source, filters=filters), by)
+    if backend not in QUERY_BACKENDS:
+        raise ValueError(f"Bộ máy truy vấn không khả dụng: {backend}")
+
+    columns = _source_columns(source)
+    grains = [grain for grain in cube_grains(by, CUBE_GRAINS) if set(grain) <= {*columns, 'Month'}]
+    query = _duckdb_cube if backend == 'duckdb' else _polars_cube
+    cube = query(source, grains, country)
+    # Cùng thứ tự cột và kiểu như build_cube để các hàm rollup dùng chung
+    for grain, table in cube.items():
+        table = table[[*grain, *measure_names()]].reset_index(drop=True)
+        counts = {name: 'int64' for name in table.columns if name.endswith('_count')}
+        if 'Month' in grain:
+            counts['Month'] = 'datetime64[ns]'
+        cube[grain] = table.astype(counts)
+    return cube
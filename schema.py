@@ -0,0 +1,74 @@
+import pandas as pd
+
+CATEGORY_COLUMNS = ['Segment', 'Ship Mode', 'Order Priority', 'Category', 'Sub-Category', 'Market', 'Region',
+                    'Country', 'City', 'State']
+POSTAL_CODE_WIDTH = 5
+DATE_COLUMNS = ['Order Date', 'Ship Date']
+# Các cột dashboard dùng (làm sạch, tổng hợp, bộ lọc, khóa của dataset tích luỹ) và kiểu của chúng;
+# None: để trình đọc tự suy kiểu. Kiểu số và chuỗi được truyền cho trình đọc, cột ngày được phân tích khi đọc
+# theo định dạng dò từ mẫu; category được áp dụng một lần trong optimize_dtypes sau khi nối các chunk
+# (khai báo category cho từng chunk chậm hơn).
+COLUMN_SCHEMA = {
+    'Row ID': None,
+    'Order ID': 'category',
+    'Order Date': 'date',
+    'Ship Date': 'date',
+    'Ship Mode': 'category',
+    'Customer ID': 'category',
+    'Segment': 'category',
+    'City': 'category',
+    'Country': 'category',
+    'Postal Code': 'str',
+    'Category': 'category',
+    'Sub-Category': 'category',
+    'Sales': 'float64',
+    'Quantity': None,
+    'Discount': 'float64',
+    'Profit': 'float64',
+    'Shipping Cost': 'float64',
+    'Order Priority': 'category',
+}
+PREVIEW_ROWS = 5
+# Cột chuỗi khác cũng chuyển sang category nếu số giá trị khác nhau nhỏ hơn tỉ lệ này so với số dòng
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def postal_code_as_category(values):
+    # Mã bưu chính dạng chuỗi cố định 5 ký tự (giữ số 0 ở đầu, ví dụ 04103), lưu dưới dạng category
+    if pd.api.types.is_numeric_dtype(values):
+        codes = values.astype('Int64').astype('string')
+    else:
+        codes = values.astype('string').str.strip().replace('', pd.NA)
+    return codes.str.zfill(POSTAL_CODE_WIDTH).astype('category')
+
+
+def schema_columns(columns):
+    # Các cột của file có trong schema, theo thứ tự trong file; None (đọc mọi cột) nếu file không theo schema
+    usecols = [col for col in columns if col in COLUMN_SCHEMA]
+    return usecols if 'Country' in usecols else None
+
+
+def read_dtypes(usecols):
+    return {col: COLUMN_SCHEMA[col] for col in usecols if COLUMN_SCHEMA[col] not in (None, 'date', 'category')}
+
+
+def optimize_dtypes(df):
+    # Chuyển các cột ít giá trị khác nhau sang category và thu nhỏ kiểu số nguyên, sửa trực tiếp trên df.
+    # Cột số thực (tiền, chiết khấu) giữ float64: float32 làm lệch tổng tiền ở hàng xu
+    schema_categories = [col for col, kind in COLUMN_SCHEMA.items() if kind == 'category']
+    for col in dict.fromkeys(CATEGORY_COLUMNS + schema_categories):
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    for col in df.select_dtypes(include='object').columns:
+        if col in DATE_COLUMNS or col == 'Postal Code':
+            continue
+        if df[col].nunique() < CATEGORY_MAX_UNIQUE_RATIO * len(df):
+            df[col] = df[col].astype('category')
+
+    if 'Postal Code' in df.columns and not isinstance(df['Postal Code'].dtype, pd.CategoricalDtype):
+        df['Postal Code'] = postal_code_as_category(df['Postal Code'])
+
+    for col in df.select_dtypes(include='integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
@@ -0,0 +1,147 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+# Sai số tương đối của phân vị ước lượng (1%)
+DEFAULT_ALPHA = 0.01
+
+
+class QuantileSketch:
+    # Sketch phân vị kiểu DDSketch: đếm giá trị theo các bucket logarit với sai số tương đối alpha.
+    # Có thể cập nhật theo từng chunk và gộp (merge) giữa các phần dữ liệu / tiến trình mà không cần giữ dữ liệu gốc.
+    def __init__(self, alpha=DEFAULT_ALPHA):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _add_buckets(self, store, magnitudes):
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, n in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + n
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+        self._add_buckets(self.positive, values[values > 0])
+        self._add_buckets(self.negative, -values[values < 0])
+        self.zero_count += int(np.count_nonzero(values == 0))
+        self.count += int(values.size)
+        self.total += float(values.sum())
+        self.total_sq += float(np.square(values).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError("Không thể gộp hai sketch có alpha khác nhau")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, n in other_store.items():
+                store[key] = store.get(key, 0) + n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _bucket_value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        if self.count == 0:
+            return math.nan
+        # Thứ hạng theo nội suy tuyến tính giống pandas.quantile
+        rank = q * (self.count - 1)
+        seen = 0
+        # Thứ tự tăng dần: số âm (độ lớn giảm dần), số 0, số dương (độ lớn tăng dần)
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return max(-self._bucket_value(key), self.min)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return min(self._bucket_value(key), self.max)
+        return self.max
+
+    def quantiles(self, qs):
+        return [self.quantile(q) for q in qs]
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def std(self):
+        # Độ lệch chuẩn tổng thể (ddof=0), giống scipy.stats.zscore
+        if not self.count:
+            return math.nan
+        return math.sqrt(max(self.total_sq / self.count - self.mean ** 2, 0.0))
+
+    def to_dict(self):
+        return {
+            'alpha': self.alpha,
+            'positive': [[k, n] for k, n in self.positive.items()],
+            'negative': [[k, n] for k, n in self.negative.items()],
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'total': self.total,
+            'total_sq': self.total_sq,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['alpha'])
+        sketch.positive = {int(k): int(n) for k, n in data['positive']}
+        sketch.negative = {int(k): int(n) for k, n in data['negative']}
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.total = data['total']
+        sketch.total_sq = data['total_sq']
+        sketch.min = math.inf if data['min'] is None else data['min']
+        sketch.max = -math.inf if data['max'] is None else data['max']
+        return sketch
+
+
+def update_sketches(sketches, df, cols, alpha=DEFAULT_ALPHA):
+    # sketches: dict {tên cột: QuantileSketch}, được cập nhật tại chỗ
+    for col in cols:
+        if col in df.columns:
+            sketches.setdefault(col, QuantileSketch(alpha)).update(df[col].to_numpy(dtype=np.float64, na_value=np.nan))
+    return sketches
+
+
+def sketch_stats(sketches, cols):
+    # Bảng Q1/trung vị/Q3/mean/std cho từng cột, cùng dạng với kết quả tính chính xác
+    rows = {}
+    for col in cols:
+        if col in sketches:
+            sketch = sketches[col]
+            q1, median, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+            rows[col] = {'q1': q1, 'median': median, 'q3': q3, 'mean': sketch.mean, 'std': sketch.std}
+    return pd.DataFrame.from_dict(rows, orient='index')
+
+
+def grouped_sketch_stats(sketches, cols):
+    # sketches: {nhóm: {cột: sketch}} -> {tên thống kê: bảng nhóm x cột}, cùng dạng với grouped_outlier_bounds
+    group_stats = {group: sketch_stats(group_sketches, cols) for group, group_sketches in sketches.items()}
+    return {name: pd.DataFrame({group: frame[name] for group, frame in group_stats.items()}).T
+            for name in ['q1', 'median', 'q3', 'mean', 'std']}
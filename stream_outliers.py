@@ -0,0 +1,140 @@
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pyarrow.parquet as pq
+
+from ingest import CHUNK_SIZE, iter_chunks
+from outliers import OUTLIER_METHODS, apply_grouped_bounds, bounds_from_stats, handle_outliers
+from pipeline import DEFAULT_OPTIONS
+from sketches import DEFAULT_ALPHA, QuantileSketch, grouped_sketch_stats, sketch_stats, update_sketches
+
+
+def iter_file_chunks(path, columns=None, chunksize=CHUNK_SIZE):
+    # File Parquet đọc theo từng batch của pyarrow, CSV/XLSX theo từng chunk của ingest
+    if str(path).endswith('.parquet'):
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        with open(path, 'rb') as file:
+            yield from iter_chunks(file, usecols=columns, chunksize=chunksize)
+
+
+def sketch_chunks(chunks, cols, by=None, alpha=DEFAULT_ALPHA):
+    # Lượt 1: chỉ giữ sketch của từng cột ({cột: sketch}, hoặc {nhóm: {cột: sketch}} khi có 'by'),
+    # bộ nhớ không phụ thuộc số dòng
+    sketches = {}
+    for chunk in chunks:
+        if by is None:
+            update_sketches(sketches, chunk, cols, alpha)
+            continue
+        for group, part in chunk.groupby(by, observed=True, sort=False):
+            update_sketches(sketches.setdefault(group, {}), part, cols, alpha)
+    return sketches
+
+
+def merge_sketches(target, other):
+    # Gộp sketch của các phần dữ liệu (partition, tiến trình) vào target, giữ nguyên cấu trúc lồng nhau
+    for key, value in other.items():
+        if isinstance(value, QuantileSketch):
+            if key in target:
+                target[key].merge(value)
+            else:
+                target[key] = value
+        else:
+            merge_sketches(target.setdefault(key, {}), value)
+    return target
+
+
+def sketch_file(path, cols, by=None, alpha=DEFAULT_ALPHA, chunksize=CHUNK_SIZE):
+    columns = list(cols) if by is None else [by, *cols]
+    return sketch_chunks(iter_file_chunks(path, columns, chunksize), cols, by, alpha)
+
+
+def sketch_files(paths, cols, by=None, alpha=DEFAULT_ALPHA, workers=None, chunksize=CHUNK_SIZE):
+    # Mỗi file (ví dụ các phần Parquet của dataset tích luỹ) được sketch trong một tiến trình riêng rồi gộp lại
+    paths = [str(path) for path in paths]
+    if len(paths) == 1:
+        return sketch_file(paths[0], cols, by, alpha, chunksize)
+    sketches = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for part in executor.map(partial(sketch_file, cols=cols, by=by, alpha=alpha, chunksize=chunksize), paths):
+            merge_sketches(sketches, part)
+    return sketches
+
+
+def stream_bounds(sketches, cols, by=None, method='median', k=1.5, z_threshold=3.0):
+    # Biên ngoại lai từ sketch, cùng dạng với outlier_bounds (theo cột) hoặc grouped_outlier_bounds (nhóm x cột)
+    if by is None:
+        return bounds_from_stats(sketch_stats(sketches, cols), method, k, z_threshold)
+    return bounds_from_stats(grouped_sketch_stats(sketches, cols), method, k, z_threshold)
+
+
+def clean_chunks(chunks, cols, bounds, by=None, method='median'):
+    # Lượt 2: thay thế hoặc cắt ngoại lai theo biên đã tính, trả về từng (chunk, số ngoại lai theo cột)
+    if method not in OUTLIER_METHODS:
+        raise ValueError(f"Phương pháp xử lý ngoại lai không hợp lệ: {method}")
+    for chunk in chunks:
+        present = [col for col in cols if col in chunk.columns]
+        if by is None:
+            yield handle_outliers(chunk, present, method, bounds=bounds)
+        else:
+            yield apply_grouped_bounds(chunk, present, by, bounds, method)
+
+
+def stream_outliers(path, output, cols=None, by=None, method='median', alpha=DEFAULT_ALPHA, workers=None,
+                    chunksize=CHUNK_SIZE):
+    # Hai lượt đọc theo chunk: dựng sketch (song song theo file), rồi xử lý ngoại lai và ghi dần ra CSV;
+    # path có thể là một file hoặc danh sách file (ví dụ các phần Parquet)
+    cols = list(cols or DEFAULT_OPTIONS['numeric_cols'])
+    paths = [path] if isinstance(path, str) else list(path)
+    start = time.perf_counter()
+
+    sketches = sketch_files(paths, cols, by, alpha, workers, chunksize)
+    bounds = stream_bounds(sketches, cols, by, method)
+    sketch_seconds = time.perf_counter() - start
+
+    rows, outlier_counts = 0, dict.fromkeys(cols, 0)
+    header = True
+    for file_path in paths:
+        for chunk, counts in clean_chunks(iter_file_chunks(file_path, chunksize=chunksize), cols, bounds, by, method):
+            chunk.to_csv(output, mode='w' if header else 'a', header=header, index=False)
+            header = False
+            rows += len(chunk)
+            for col, n in counts.items():
+                outlier_counts[col] += n
+
+    return {
+        'input': paths,
+        'output': str(output),
+        'method': method,
+        'by': by,
+        'rows': rows,
+        'outlier_counts': outlier_counts,
+        'sketch_seconds': round(sketch_seconds, 3),
+        'total_seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Xử lý ngoại lai theo luồng (hai lượt đọc, biên IQR/z-score từ sketch phân vị) cho file lớn")
+    parser.add_argument('paths', nargs='+', help="File .csv, .xlsx hoặc các phần .parquet")
+    parser.add_argument('-o', '--output', required=True, help="File CSV kết quả")
+    parser.add_argument('--by', default=None, help="Tính biên riêng cho từng nhóm của cột này (ví dụ Country)")
+    parser.add_argument('--outlier-method', choices=list(OUTLIER_METHODS), default=DEFAULT_OPTIONS['outlier_method'])
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA, help="Sai số tương đối của phân vị ước lượng")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="Số tiến trình dựng sketch")
+    args = parser.parse_args(argv)
+
+    summary = stream_outliers(args.paths, args.output, by=args.by, method=args.outlier_method,
+                              alpha=args.alpha, workers=args.workers)
+    print(f'Số các giá trị ngoại lai là: {json.dumps(summary["outlier_counts"], ensure_ascii=False)}')
+    print(f"Đã ghi {summary['rows']} dòng vào {summary['output']} trong {summary['total_seconds']}s")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
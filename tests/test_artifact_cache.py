@@ -0,0 +1,24 @@
+import numpy as np
+
+from artifact_cache import ArtifactCache
+
+
+def test_spill_from_previous_run_is_discarded(tmp_path):
+    stale = tmp_path / 'aggregate-abc.pkl'
+    stale.write_bytes(b'not a pickle from this version')
+    cache = ArtifactCache('aggregate', 10_000, spill_dir=tmp_path)
+    assert not stale.exists()
+    assert cache.get('abc') is None
+
+
+def test_spill_directory_stays_under_budget(tmp_path):
+    cache = ArtifactCache('aggregate', 10_000, spill_dir=tmp_path, max_spill_bytes=20_000)
+    for key in range(10):
+        cache.put(str(key), np.zeros(1000))
+    spilled = sum(path.stat().st_size for path in tmp_path.glob('aggregate-*.pkl'))
+    assert 0 < spilled <= 20_000
+    assert cache.spill_bytes == spilled
+    # Mục mới nhất vừa bị đẩy ra vẫn nạp lại được, mục cũ nhất đã bị xoá khỏi đĩa
+    assert cache.get('8') is not None
+    assert cache.stats()['spill_hits'] == 1
+    assert cache.get('0') is None
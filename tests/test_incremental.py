@@ -0,0 +1,73 @@
+import threading
+
+import numpy as np
+import pytest
+
+import incremental
+from benchmarks.generate import generate_superstore
+from cube import rollup, select_country, total
+from query import QUERY_BACKENDS, query_cube
+from schema import optimize_dtypes
+
+
+@pytest.fixture
+def datasets_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, 'DATASETS_DIR', tmp_path / 'datasets')
+    return tmp_path / 'datasets'
+
+
+def two_appends():
+    # Hai lần nối thêm mà optimize_dtypes chọn kiểu khác nhau cho cùng một cột:
+    # 'Row ID' vừa int16 ở phần đầu, vượt int16 ở phần sau
+    df = generate_superstore(4000, seed=7)
+    first, second = df.iloc[:2000].copy(), df.iloc[2000:].copy()
+    first['Row ID'] = np.arange(1, len(first) + 1)
+    second['Row ID'] = np.arange(40_000, 40_000 + len(second))
+    incremental.append_dataset('superstore', optimize_dtypes(first))
+    incremental.append_dataset('superstore', optimize_dtypes(second))
+    return df
+
+
+def test_parts_share_one_schema(datasets_dir):
+    two_appends()
+    rows = incremental.load_rows('superstore')
+    assert len(rows) == incremental.load_state('superstore')['rows']
+    assert rows['Row ID'].max() >= 40_000
+    assert total(incremental.load_cube('superstore'), 'Sales') == pytest.approx(rows['Sales'].sum())
+
+
+@pytest.mark.parametrize('backend', QUERY_BACKENDS)
+def test_backends_read_appended_parts(datasets_dir, backend):
+    two_appends()
+    rows = incremental.load_rows('superstore')
+    country = rows['Country'].value_counts().index[0]
+    expected = select_country(incremental.load_cube('superstore'), country)
+
+    cube = query_cube(incremental.part_paths('superstore'), backend, country)
+    assert total(cube, 'Sales') == pytest.approx(total(expected, 'Sales'))
+    by_segment = rollup(cube, 'Segment', Sales=('Sales', 'sum'))['Sales'].to_dict()
+    expected_segment = rollup(expected, 'Segment', Sales=('Sales', 'sum'))['Sales'].to_dict()
+    assert by_segment == pytest.approx(expected_segment)
+
+    all_countries = query_cube(incremental.part_paths('superstore'), backend, by=('Country',))
+    assert total(select_country(all_countries, country), 'Sales') == pytest.approx(total(expected, 'Sales'))
+
+
+@pytest.mark.parametrize('name', ['', '../x', 'a/b', 'tên có dấu'])
+def test_rejects_unsafe_dataset_names(datasets_dir, name):
+    with pytest.raises(ValueError):
+        incremental.append_dataset(name, generate_superstore(10, seed=1))
+    assert not datasets_dir.exists()
+
+
+def test_concurrent_appends_keep_every_part(datasets_dir):
+    df = optimize_dtypes(generate_superstore(2000, seed=3))
+    threads = [threading.Thread(target=incremental.append_dataset, args=('superstore', part))
+               for part in (df.iloc[:1000], df.iloc[1000:])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    state = incremental.load_state('superstore')
+    assert len(state['parts']) == 2
+    assert len(incremental.load_rows('superstore')) == state['rows']
@@ -0,0 +1,30 @@
+import pytest
+
+from benchmarks.generate import generate_superstore
+from cube import rollup, total
+from pipeline import clean_all
+from query import QUERY_BACKENDS, query_cube
+from schema import optimize_dtypes
+
+
+@pytest.fixture
+def cleaned_file(tmp_path):
+    # File Parquet giữ cột chiều kiểu category như dữ liệu đã làm sạch của ứng dụng
+    df = clean_all(optimize_dtypes(generate_superstore(5000, seed=2)))
+    path = tmp_path / 'cleaned.parquet'
+    df.to_parquet(path)
+    return df, path
+
+
+@pytest.mark.parametrize('backend', QUERY_BACKENDS)
+def test_backends_match_pandas_cube(cleaned_file, backend):
+    df, path = cleaned_file
+    country = df['Country'].iloc[0]
+    expected = query_cube(df, 'pandas', country)
+    cube = query_cube([path], backend, country)
+    assert total(cube, 'Sales') == pytest.approx(total(expected, 'Sales'))
+    # Cùng thứ tự nhóm trên mọi bộ máy, không theo thứ tự xuất hiện của Categorical
+    by_product = rollup(cube, 'Sub-Category', Sales=('Sales', 'sum'))
+    expected_product = rollup(expected, 'Sub-Category', Sales=('Sales', 'sum'))
+    assert list(by_product.index.astype(str)) == list(expected_product.index.astype(str))
+    assert by_product['Sales'].to_numpy() == pytest.approx(expected_product['Sales'].to_numpy())
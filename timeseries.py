@@ -0,0 +1,53 @@
+# Độ chi tiết thời gian (bí danh resample của pandas) và số kỳ trong một năm để so sánh cùng kỳ
+GRANULARITIES = {
+    'D': 'Ngày',
+    'W': 'Tuần',
+    'ME': 'Tháng',
+    'QE': 'Quý',
+    'YE': 'Năm',
+}
+PERIODS_PER_YEAR = {'D': 365, 'W': 52, 'ME': 12, 'QE': 4, 'YE': 1}
+# Chiều được giữ lại trong bảng theo ngày: biểu đồ xu hướng chưa lọc theo chiều nào nên mặc định chỉ tổng theo ngày
+# (tích chéo các chiều làm bảng lớn gấp nhiều lần mà không được dùng); truyền dims khi cần lọc bằng members
+DAILY_DIMENSIONS = []
+METRICS = ['Sales', 'Profit', 'Quantity', 'Orders', 'Delivery Time']
+
+
+def build_daily(df, dims=DAILY_DIMENSIONS):
+    # Một lần quét dữ liệu gốc: tổng theo ngày cho từng tổ hợp giá trị của các chiều;
+    # thời gian giao hàng giữ dạng tổng + số đếm để tính lại trung bình ở mọi độ chi tiết
+    dims = [dim for dim in dims if dim in df.columns]
+    frame = df.assign(Day=df['Order Date'].dt.normalize())
+    daily = frame.groupby(['Day', *dims], dropna=False, observed=True, sort=True).agg(
+        Sales=('Sales', 'sum'),
+        Profit=('Profit', 'sum'),
+        Quantity=('Quantity', 'sum'),
+        Orders=('Order ID', 'count'),
+        delivery_sum=('Delivery Time', 'sum'),
+        delivery_count=('Delivery Time', 'count'),
+    )
+    return daily.reset_index()
+
+
+def series(daily, granularity='ME', members=None):
+    # Chuỗi thời gian ở độ chi tiết bất kỳ, cộng dồn từ bảng theo ngày; members: {chiều: các giá trị giữ lại}
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Độ chi tiết thời gian không hợp lệ: {granularity}")
+    for dim, values in (members or {}).items():
+        if values:
+            daily = daily[daily[dim].isin(values)]
+    totals = daily.groupby('Day')[['Sales', 'Profit', 'Quantity', 'Orders', 'delivery_sum', 'delivery_count']].sum()
+    result = totals.resample(granularity).sum()
+    result['Delivery Time'] = result['delivery_sum'] / result['delivery_count'].where(result['delivery_count'] > 0)
+    return result[METRICS]
+
+
+def rolling_mean(result, window):
+    # Trung bình trượt theo số kỳ của độ chi tiết đang xem
+    return result.rolling(window, min_periods=1).mean()
+
+
+def year_over_year(result, granularity):
+    # Tăng trưởng so với cùng kỳ năm trước (tỷ lệ), NaN khi chưa có dữ liệu năm trước
+    previous = result.shift(PERIODS_PER_YEAR[granularity])
+    return result / previous.where(previous != 0) - 1
@@ -0,0 +1,572 @@
+import streamlit as st
+import plotly.express as px
+import plotly.graph_objects as go
+
+from charts import downsample, top_n_with_others
+from cube import build_cube, covering_table, cube_size, rollup, total
+from forecast import FORECAST_GROUPS, FORECAST_HORIZON, TOTAL_LABEL, batch_forecast, forecast_summary
+from profiling import NO_PERF
+from timeseries import GRANULARITIES, METRICS, build_daily, rolling_mean, series, year_over_year
+
+TREND_COLORS = {'Sales': 'dodgerblue', 'Profit': 'coral'}
+FORECAST_METRICS = ['Sales', 'Profit', 'Quantity']
+TICK_FORMATS = {'D': '%d %b %Y', 'W': '%d %b %Y', 'ME': '%b %Y', 'QE': '%b %Y', 'YE': '%Y'}
+SECTIONS = ["Tổng quan dữ liệu", "Trực quan hóa", "Phân tích dữ liệu", 'Insight và Giải pháp', "So sánh quốc gia"]
+
+
+# Tiến độ job xử lý nền: fragment tự chạy lại mỗi giây, khi job xong thì tải lại toàn bộ trang
+@st.fragment(run_every=1)
+def render_job_progress(job):
+    st.progress(job.fraction, text=f"{job.label}: {job.fraction:.0%}")
+    st.dataframe(job.progress.to_frame(), hide_index=True)
+    if job.status == 'error':
+        st.error(f"{job.label} thất bại: {job.error}")
+    elif job.done:
+        st.rerun(scope='app')
+
+
+def render_raw_preview(df, load_detail=None):
+    st.write("Dữ liệu đã tải lên:")
+    # Dữ liệu đã đọc chỉ gồm các cột dashboard dùng; cột chi tiết (tên sản phẩm, khách hàng...) đọc khi bật
+    if load_detail is not None and st.toggle("Hiện đủ các cột của file"):
+        st.dataframe(load_detail())
+    else:
+        st.dataframe(df.head())
+
+
+# Bộ lọc ở sidebar: giá trị để trống nghĩa là không lọc cột đó
+def render_filters(index):
+    with st.sidebar.expander("Bộ lọc"):
+        date_range = None
+        bounds = index.date_range()
+        if bounds is not None:
+            picked = st.date_input("Ngày đặt hàng", value=bounds, min_value=bounds[0], max_value=bounds[1])
+            # Khi đang chọn dở (mới có ngày bắt đầu) thì chưa lọc theo ngày
+            if len(picked) == 2 and tuple(picked) != bounds:
+                date_range = tuple(picked)
+        selected = {col: tuple(st.multiselect(col, list(values))) for col, values in index.values.items()}
+    return {col: chosen for col, chosen in selected.items() if chosen}, date_range
+
+
+# 2. Tổng quan dữ liệu
+def overview_tables(df_cleaned, cube):
+    total_orders = len(df_cleaned)
+    total_sales = total(cube, 'Sales')
+    total_customers = df_cleaned['Customer ID'].nunique()
+    total_profit = total(cube, 'Profit')
+    kpis = {
+        'total_orders': total_orders,
+        'total_sales': total_sales,
+        'total_profit': total_profit,
+        'total_customers': total_customers,
+    }
+
+    # Grouping and aggregating data
+    segment_analysis = rollup(
+        cube, 'Segment',
+        total_sales=('Sales', 'sum'),
+        total_profit=('Profit', 'sum'),
+        total_orders=('Order ID', 'count')
+    ).reset_index()
+
+    # Format numbers for better readability
+    segment_analysis['total_sales'] = segment_analysis['total_sales'].map('{:,.2f}'.format)
+    segment_analysis['total_profit'] = segment_analysis['total_profit'].map('{:,.2f}'.format)
+    segment_analysis['total_orders'] = segment_analysis['total_orders'].map('{:,}'.format)
+
+    # Rename columns for display
+    segment_analysis = segment_analysis.rename(columns={
+        "total_sales": "Tổng doanh số",
+        "total_profit": "Tổng lợi nhuận",
+        "total_orders": "Tổng số đơn hàng"
+    })
+
+    # Grouping and aggregating data for shipping analysis
+    shipping_analysis = rollup(
+        cube, 'Ship Mode',
+        total_orders=('Order ID', 'count'),
+        avg_shipping_cost=('Shipping Cost', 'mean'),
+        avg_profit=('Profit', 'mean')
+    ).reset_index()
+
+    # Format numbers for better readability
+    shipping_analysis['avg_shipping_cost'] = shipping_analysis['avg_shipping_cost'].map('{:,.2f}'.format)
+    shipping_analysis['avg_profit'] = shipping_analysis['avg_profit'].map('{:,.2f}'.format)
+    shipping_analysis['total_orders'] = shipping_analysis['total_orders'].map('{:,}'.format)
+
+    # Rename columns for display
+    shipping_analysis = shipping_analysis.rename(columns={
+        "total_orders": "Tổng số đơn hàng",
+        "avg_shipping_cost": "Chi phí vận chuyển trung bình",
+        "avg_profit": "Lợi nhuận trung bình"
+    })
+
+    # Grouping and aggregating data for order priority
+    priority_analysis = rollup(
+        cube, 'Order Priority',
+        total_orders=('Order ID', 'count'),
+        avg_shipping_cost=('Shipping Cost', 'mean'),
+        avg_profit=('Profit', 'mean')
+    ).reset_index()
+
+    # Format numbers for better readability
+    priority_analysis['avg_shipping_cost'] = priority_analysis['avg_shipping_cost'].map('{:,.2f}'.format)
+    priority_analysis['avg_profit'] = priority_analysis['avg_profit'].map('{:,.2f}'.format)
+    priority_analysis['total_orders'] = priority_analysis['total_orders'].map('{:,}'.format)
+
+    # Rename columns for display
+    priority_analysis = priority_analysis.rename(columns={
+        "total_orders": "Số lượng đơn hàng",
+        "avg_shipping_cost": "Chi phí vận chuyển trung bình",
+        "avg_profit": "Lợi nhuận trung bình"
+    })
+
+    # Grouping and aggregating data
+    sub_analysis = rollup(
+        cube, 'Sub-Category',
+        total_sales=('Sales', 'sum'),
+        total_profit=('Profit', 'sum'),
+        total_orders=('Order ID', 'count')
+    ).reset_index()
+
+    # Format numbers for better readability
+    sub_analysis['total_sales'] = sub_analysis['total_sales'].map('{:,.2f}'.format)
+    sub_analysis['total_profit'] = sub_analysis['total_profit'].map('{:,.2f}'.format)
+    sub_analysis['total_orders'] = sub_analysis['total_orders'].map('{:,}'.format)
+
+    # Rename columns for display
+    sub_analysis = sub_analysis.rename(columns={
+        "total_sales": "Tổng doanh số",
+        "total_profit": "Tổng lợi nhuận",
+        "total_orders": "Tổng số đơn hàng"
+    })
+
+    return kpis, segment_analysis, shipping_analysis, priority_analysis, sub_analysis
+
+
+def render_overview(selected_country, df_cleaned, cube, average_delivery_time, perf=NO_PERF):
+    with perf.stage('overview/tables', rows_in=cube_size(cube)):
+        kpis, segment_analysis, shipping_analysis, priority_analysis, sub_analysis = overview_tables(df_cleaned, cube)
+
+    st.subheader(f"Tổng quan dữ liệu - {selected_country}")
+    st.write(f"**Số lượng đơn hàng**: {kpis['total_orders']}")
+    st.write(f"**Tổng doanh số**: ${kpis['total_sales']:,.2f}")
+    st.write(f"**Tổng lợi nhuận**: ${kpis['total_profit']:,.2f}")
+    st.write(f"**Số lượng khách hàng**: {kpis['total_customers']}")
+    st.write(f"**Thời gian giao hàng trung bình**: {average_delivery_time:.2f} ngày")
+
+    st.subheader("Doanh số và lợi nhuận theo phân khúc khách hàng")
+    st.dataframe(segment_analysis)
+
+    st.subheader("Phân tích theo phân khúc vận chuyển")
+    st.dataframe(shipping_analysis)
+
+    st.subheader("Phân tích theo thứ tự ưu tiên")
+    st.dataframe(priority_analysis)
+
+    st.subheader("Phân tích theo danh mục con (Sub-Category)")
+    st.dataframe(sub_analysis)
+
+
+# 3. Trực quan hóa dữ liệu
+# Các biểu đồ được ghi nhớ theo cache_key (dataset, quốc gia, tuỳ chọn) nên chỉ dựng lại khi dữ liệu đổi;
+# dùng cache_resource để trả lại đúng đối tượng Figure, tránh chi phí unpickle Plotly ở mỗi lần tải lại
+@st.cache_resource(show_spinner="Đang tổng hợp theo ngày...", max_entries=32)
+def daily_rollup(cache_key, _df_cleaned):
+    # Bảng tổng theo ngày dựng một lần cho mỗi dữ liệu đang xem; đổi độ chi tiết chỉ cộng dồn lại từ bảng này
+    return build_daily(_df_cleaned)
+
+
+@st.cache_resource(show_spinner="Đang dựng biểu đồ...", max_entries=32)
+def trend_figure(cache_key, granularity, metrics, window, show_yoy, large_data, _daily):
+    # Chế độ dữ liệu lớn: WebGL cho chuỗi thời gian, giới hạn số điểm trên mỗi đường
+    scatter = go.Scattergl if large_data else go.Scatter
+
+    # Xu hướng theo thời gian ở độ chi tiết đã chọn, tuỳ chọn trung bình trượt và tăng trưởng so với cùng kỳ
+    sales_trend = series(_daily, granularity)[list(metrics)]
+    if show_yoy:
+        sales_trend = year_over_year(sales_trend, granularity)
+    smoothed = rolling_mean(sales_trend, window) if window > 1 else None
+    if large_data:
+        sales_trend = downsample(sales_trend)
+        if smoothed is not None:
+            smoothed = downsample(smoothed)
+
+    fig1 = go.Figure()
+    for metric in metrics:
+        fig1.add_trace(scatter(
+            x=sales_trend.index,
+            y=sales_trend[metric],
+            mode='lines',
+            name=metric,
+            line=dict(color=TREND_COLORS.get(metric), width=2)
+        ))
+        if smoothed is not None:
+            fig1.add_trace(scatter(
+                x=smoothed.index,
+                y=smoothed[metric],
+                mode='lines',
+                name=f'{metric} (TB {window} kỳ)',
+                line=dict(color=TREND_COLORS.get(metric), width=1, dash='dash')
+            ))
+
+    granularity_label = GRANULARITIES[granularity].lower()
+    title = (f"Tăng trưởng so với cùng kỳ năm trước theo {granularity_label}" if show_yoy
+             else f"Biểu đồ thể hiện doanh thu theo {granularity_label} và xu hướng lợi nhuận")
+    fig1.update_layout(
+        title=dict(text=title, font=dict(size=20, color='white')),
+        xaxis=dict(
+            title=GRANULARITIES[granularity],
+            tickformat=TICK_FORMATS[granularity],
+            tickfont=dict(size=12, color='white'),
+            showgrid=True
+        ),
+        yaxis=dict(
+            title="Tăng trưởng" if show_yoy else "Giá trị",
+            tickformat='.0%' if show_yoy else None,
+            tickfont=dict(size=12, color='white'),
+            showgrid=True
+        ),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1,
+            font=dict(size=12, color='white')
+        ),
+        template="plotly_dark",
+        margin=dict(l=40, r=40, t=60, b=50)
+    )
+    return fig1
+
+
+def render_trend_controls():
+    col1, col2, col3 = st.columns(3)
+    granularity = col1.selectbox("Độ chi tiết thời gian", list(GRANULARITIES), index=2, format_func=GRANULARITIES.get)
+    window = col2.number_input("Trung bình trượt (số kỳ)", min_value=1, max_value=52, value=1,
+                               help="1: không vẽ đường trung bình trượt.")
+    show_yoy = col3.checkbox("So với cùng kỳ năm trước (YoY)")
+    metrics = st.multiselect("Chỉ số", METRICS, default=['Sales', 'Profit'])
+    return granularity, tuple(metrics) or ('Sales',), int(window), show_yoy
+
+
+@st.cache_resource(show_spinner="Đang dự báo...", max_entries=32)
+def forecast_results(cache_key, group, metric, horizon, _cube, _df_cleaned):
+    # Mọi chuỗi của cách chia đã chọn được khớp cùng lúc; kết quả dùng lại cho mọi chuỗi được chọn để xem.
+    # Cách chia chi tiết (Danh mục con × Thành phố) không nằm trong cube nên chỉ được tổng hợp khi được chọn
+    by = FORECAST_GROUPS[group]
+    cube = _cube
+    if covering_table(cube, [*by, 'Month']) is None:
+        cube = build_cube(_df_cleaned, grains=[(*by, 'Month')])
+    result = batch_forecast(cube, by, metric, horizon)
+    if result is None:
+        return None, None
+    return result, forecast_summary(result)
+
+
+def series_label(member):
+    return ' × '.join(map(str, member)) if isinstance(member, tuple) else str(member)
+
+
+@st.cache_resource(show_spinner="Đang dựng biểu đồ...", max_entries=32)
+def forecast_figure(cache_key, group, metric, horizon, member, _result):
+    actual = _result['actual'].loc[member]
+    fitted = _result['fitted'].loc[member]
+    mean, lower, upper = (_result[part].loc[member] for part in ['mean', 'lower', 'upper'])
+    color = TREND_COLORS.get(metric, 'mediumseagreen')
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=actual.index, y=actual, mode='lines', name='Thực tế', line=dict(color=color, width=2)))
+    fig.add_trace(go.Scatter(x=fitted.index, y=fitted, mode='lines', name='Mô hình',
+                             line=dict(color=color, width=1, dash='dot')))
+    # Dải khoảng dự báo: vẽ cận trên rồi tô xuống cận dưới
+    fig.add_trace(go.Scatter(x=upper.index, y=upper, mode='lines', line=dict(width=0), showlegend=False,
+                             hoverinfo='skip'))
+    fig.add_trace(go.Scatter(x=lower.index, y=lower, mode='lines', line=dict(width=0), fill='tonexty',
+                             fillcolor='rgba(255, 215, 0, 0.25)', name='Khoảng dự báo 95%'))
+    fig.add_trace(go.Scatter(x=mean.index, y=mean, mode='lines+markers', name='Dự báo',
+                             line=dict(color='gold', width=2)))
+
+    title = f"Dự báo {metric} {horizon} tháng tới"
+    if group != TOTAL_LABEL:
+        title += f" - {series_label(member)}"
+    fig.update_layout(
+        title=dict(text=title, font=dict(size=20, color='white')),
+        xaxis=dict(title="Tháng", tickformat='%b %Y', tickfont=dict(size=12, color='white'), showgrid=True),
+        yaxis=dict(title="Giá trị", tickfont=dict(size=12, color='white'), showgrid=True),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1,
+                    font=dict(size=12, color='white')),
+        template="plotly_dark",
+        margin=dict(l=40, r=40, t=60, b=50)
+    )
+    return fig
+
+
+def forecast_table(summary, horizon):
+    table = summary.rename(columns={
+        'last_12_months': '12 tháng gần nhất',
+        'forecast_total': f'Tổng dự báo {horizon} tháng',
+        'next_month': 'Tháng tới',
+        'next_lower': 'Cận dưới',
+        'next_upper': 'Cận trên',
+    })
+    table.index = table.index.map(series_label)
+    return table.style.format('{:,.2f}')
+
+
+def render_forecast(cache_key, df_cleaned, cube, perf=NO_PERF):
+    col1, col2 = st.columns(2)
+    group = col1.selectbox("Dự báo theo", list(FORECAST_GROUPS))
+    metric = col2.selectbox("Chỉ số dự báo", FORECAST_METRICS)
+    horizon = st.slider("Số tháng dự báo", min_value=1, max_value=24, value=FORECAST_HORIZON)
+    with perf.stage('visualization/forecast', rows_in=cube_size(cube)) as stage:
+        result, summary = forecast_results(cache_key, group, metric, horizon, cube, df_cleaned)
+        stage['rows_out'] = 0 if summary is None else len(summary)
+    if result is None:
+        st.info("Không có dữ liệu để dự báo.")
+        return
+
+    # Chuỗi được sắp theo tổng dự báo giảm dần, mặc định xem chuỗi lớn nhất
+    member = summary.index[0]
+    if group != TOTAL_LABEL:
+        member = st.selectbox(f"Chuỗi ({len(summary):,} chuỗi)", list(summary.index), format_func=series_label)
+    fig = forecast_figure(cache_key, group, metric, horizon, member, result)
+    plotly_chart(perf, 'forecast', fig, use_container_width=True)
+
+    if group != TOTAL_LABEL:
+        with st.expander("Bảng dự báo của mọi chuỗi"):
+            st.dataframe(forecast_table(summary, horizon))
+
+
+@st.cache_resource(show_spinner="Đang dựng biểu đồ...", max_entries=32)
+def visualization_figures(cache_key, selected_country, large_data, _cube):
+    cube = _cube
+
+    city_sales = rollup(cube, 'City', Sales=('Sales', 'sum'), Profit=('Profit', 'sum')).sort_values(by='Sales',
+                                                                                     ascending=False)
+    if large_data:
+        city_sales = top_n_with_others(city_sales)
+    fig2 = px.bar(city_sales, x=city_sales.index, y=['Sales','Profit'], title="Doanh số và lợi nhuận theo thành phố",
+                  barmode='group',color_discrete_map={'Sales':'deepskyblue','Profit':'wheat'},labels={'value':'Giá trị','variable':'Phân loại'})
+
+    category_profit = rollup(cube, 'Category', Profit=('Profit', 'sum'))
+    fig3 = px.pie(category_profit, values='Profit', names=category_profit.index,
+                  title="Lợi nhuận theo danh mục sản phẩm")
+
+    # So sánh doanh số giữa các danh mục sản phẩm
+    category_sales = rollup(cube, 'Category', Sales=('Sales', 'sum'))
+    fig4 = px.pie(category_sales, values='Sales', names=category_sales.index,
+                  title="Doanh số theo danh mục sản phẩm")
+
+    # Cube chỉ chứa quốc gia đang chọn nên không cần nhóm theo 'Country' rồi lọc lại
+    cleaned_data = rollup(cube, ["Category", "Segment"], Sales=('Sales', 'sum'), Profit=('Profit', 'sum')).reset_index()
+
+    fig5 = px.bar(
+        cleaned_data,
+        x="Category",
+        y="Sales",
+        color="Segment",
+        barmode="group",
+        text_auto=".2s",
+        title=f"Tổng Doanh Thu theo phân khúc khách hàng tại {selected_country}",
+        labels={"Sales": "Doanh Thu", "Category": "Danh mục sản phẩm", "Segment": "Phân khúc"},
+    )
+
+    fig6 = px.line(
+        cleaned_data,
+        x="Category",
+        y="Profit",
+        color="Segment",
+        markers=True,
+        title=f"Tổng Lợi Nhuận theo phân khúc khách hàng tại {selected_country}",
+        labels={"Profit": "Lợi nhuận", "Category": "Danh mục sản phẩm", "Segment": "Phân khúc"},
+    )
+
+    return fig2, fig3, fig4, fig5, fig6
+
+
+def plotly_chart(perf, name, fig, **kwargs):
+    # Bao gồm cả thời gian tuần tự hoá biểu đồ Plotly để gửi xuống trình duyệt
+    with perf.stage(f'chart/{name}'):
+        st.plotly_chart(fig, **kwargs)
+
+
+def render_visualization(selected_country, fig1, figures, cache_key, df_cleaned, cube, perf=NO_PERF):
+    fig2, fig3, fig4, fig5, fig6 = figures
+    # Dự báo đặt cạnh biểu đồ xu hướng
+    col_trend, col_forecast = st.columns(2)
+    with col_trend:
+        plotly_chart(perf, 'fig1', fig1, use_container_width=True)
+    with col_forecast:
+        render_forecast(cache_key, df_cleaned, cube, perf)
+    plotly_chart(perf, 'fig2', fig2)
+    plotly_chart(perf, 'fig3', fig3)
+    plotly_chart(perf, 'fig4', fig4)
+
+    st.title("So sánh hiệu quả kinh doanh quốc gia theo phân khúc khách hàng")
+    plotly_chart(perf, 'fig5', fig5, use_container_width=True)
+    plotly_chart(perf, 'fig6', fig6, use_container_width=True)
+
+
+@st.cache_resource(show_spinner="Đang dựng biểu đồ...", max_entries=32)
+def analysis_figures(cache_key, selected_country, _cube):
+    cube = _cube
+
+    ship_mode_analysis = rollup(cube, 'Ship Mode', Sales=('Sales', 'sum'), Profit=('Profit', 'sum'))
+    fig7 = px.bar(ship_mode_analysis, x=ship_mode_analysis.index, y=['Sales','Profit'],
+                  title="Doanh thu và lợi nhuận theo trạng thái vận chuyển",barmode='group',labels={'value':'Giá trị','variable':'Phân loại'},color_discrete_map={'Sales':'dodgerblue','Profit':'powderblue'})
+
+    order_priority_analysis = rollup(cube, 'Order Priority', Sales=('Sales', 'sum'), Profit=('Profit', 'sum'))
+    fig8 = px.bar(order_priority_analysis, x=order_priority_analysis.index, y=['Sales','Profit'],
+                  title="Doanh thu và lợi nhuận theo thứ tự ưu tiên đơn hàng",barmode='group',labels={'value':'Giá trị','variable':'Phân loại'},color_discrete_map={'Sales':'dodgerblue','Profit':'powderblue'})
+
+    return fig7, fig8
+
+
+def render_analysis(selected_country, figures, perf=NO_PERF):
+    fig7, fig8 = figures
+    st.subheader(f"Phân tích dữ liệu - {selected_country}")
+    plotly_chart(perf, 'fig7', fig7)
+    plotly_chart(perf, 'fig8', fig8)
+
+
+def render_insights():
+    st.subheader('Insight:')
+    st.write("- Consumer là nhóm khách hàng chủ lực, đóng góp lớn nhất vào doanh số, lợi nhuận và số lượng đơn hàng.")
+    st.write("- Tỷ suất lợi nhuận của Consumer (14.75%) thấp hơn 2 nhóm còn lại do chi phí marketing, bán hàng, vận hành hoặc chiết khấu cao hơn.")
+    st.write("- Corporate (15.36%) và Home Office (16.07%) có tỷ suất lợi nhuận tốt, cho thấy tiềm năng phát triển trong tương lai.")
+    st.write("- Standard Class là phương thức vận chuyển chủ lực với số lượng đơn hàng cao nhất (1,307) và lợi nhuận trung bình cao nhất (26.44), nhờ chi phí thấp và thời gian giao hàng phù hợp.")
+    st.write("- Same Day có lợi nhuận trung bình cao thứ hai nhưng số lượng đơn thấp nhất (108), có thể do giá cao, marketing chưa hiệu quả hoặc giới hạn dịch vụ.")
+    st.write("- First Class và Second Class cần xem xét lại về giá, dịch vụ hoặc marketing để tăng tính cạnh tranh và thu hút khách hàng.")
+    st.write("- Nhóm Medium có số lượng đơn hàng cao nhất (1,223) và chi phí vận chuyển trung bình thấp nhất (14.14), cho thấy đang mang lại hiệu quả cao nhất cho doanh nghiệp.")
+    st.write("- Art có lợi nhuận cao nhất (8,683.43), trong khi Tables có doanh số (4,919.04) và lợi nhuận (600.15) thấp, cho thấy danh mục Tables có thể không hiệu quả về kinh doanh.")
+    st.write("- Doanh thu tăng qua các năm, đạt đỉnh vào tháng 8/2014 (17.95185k), do ngành bán lẻ trực tuyến phát triển nhờ internet, niềm tin người tiêu dùng và thương mại điện tử")
+    st.write("- Office Supplies dẫn đầu về doanh số (45.9%) và lợi nhuận (53.7%), điều này cho thấy đây là một ngành hàng có biên lợi nhuận cao và đáng được đầu tư, mở rộng hơn nữa.")
+    st.subheader('Giải pháp:')
+    st.write("- Tăng doanh thu cho các danh mục có biên lợi nhuận cao.")
+    st.write("- Giảm thiểu danh mục có doanh thu thấp, lợi nhuận thấp.")
+    st.write("- Phân tích xu hướng mua hàng, đánh giá xem danh mục nào có tiềm năng tăng trưởng.")
+    st.write("- Thử nghiệm chiến dịch tiếp thị trong 3-6 tháng để đo lường hiệu quả của việc tập trung vào danh mục có lợi nhuận cao.")
+    st.write("- Xem xét dữ liệu bán hàng theo quý, nếu danh mục không cải thiện, cân nhắc thay thế bằng sản phẩm khác.")
+    st.write("- Tối ưu chi phí để tăng lợi nhuận.")
+    st.write("- Ổn định doanh thu để giảm rủi ro.")
+    st.write("- Tăng lợi nhuận bằng cách cải thiện biên lợi nhuận.")
+    st.write("- Dự báo và lập kế hoạch tài chính.")
+
+
+# 5. So sánh quốc gia
+def comparison_tables(df_all, cube_all):
+    # Chỉ số của mọi quốc gia từ cube toàn bộ dữ liệu và một lượt groupby cho các chỉ số không cộng dồn được
+    kpis = rollup(
+        cube_all, 'Country',
+        total_orders=('Order ID', 'count'),
+        total_sales=('Sales', 'sum'),
+        total_profit=('Profit', 'sum'),
+    )
+    kpis = kpis.join(df_all.groupby('Country', observed=True).agg(
+        total_customers=('Customer ID', 'nunique'),
+        avg_delivery_time=('Delivery Time', 'mean'),
+    ))
+    kpis['margin'] = kpis['total_profit'] / kpis['total_sales'].where(kpis['total_sales'] != 0)
+    kpis = kpis.sort_values('total_sales', ascending=False)
+
+    # Tỷ trọng doanh số theo phân khúc khách hàng của từng quốc gia
+    segment_mix = rollup(cube_all, ['Country', 'Segment'], Sales=('Sales', 'sum'))['Sales'].unstack(fill_value=0)
+    segment_mix = segment_mix.div(segment_mix.sum(axis=1).where(lambda total: total != 0), axis=0)
+
+    # Dự báo doanh số mọi chuỗi Phân khúc × Quốc gia trong một lần khớp
+    segment_forecast = batch_forecast(cube_all, ['Country', 'Segment'])
+    segment_forecast = None if segment_forecast is None else forecast_summary(segment_forecast)
+    return kpis, segment_mix, segment_forecast
+
+
+@st.cache_resource(show_spinner="Đang dựng biểu đồ...", max_entries=32)
+def comparison_figures(cache_key, countries, _kpis, _segment_mix):
+    kpis = _kpis.loc[list(countries)]
+    segment_mix = _segment_mix.reindex(list(countries))
+
+    fig9 = px.bar(kpis, x=kpis.index, y=['total_sales', 'total_profit'], barmode='group',
+                  title="Doanh số và lợi nhuận theo quốc gia",
+                  labels={'value': 'Giá trị', 'variable': 'Phân loại', 'Country': 'Quốc gia'})
+
+    mix = segment_mix.reset_index().melt(id_vars='Country', var_name='Segment', value_name='Share')
+    fig10 = px.bar(mix, x='Country', y='Share', color='Segment', barmode='stack',
+                   title="Cơ cấu doanh số theo phân khúc khách hàng",
+                   labels={'Share': 'Tỷ trọng', 'Country': 'Quốc gia', 'Segment': 'Phân khúc'})
+    fig10.update_yaxes(tickformat='.0%')
+
+    fig11 = px.bar(kpis, x=kpis.index, y='margin', title="Tỷ suất lợi nhuận theo quốc gia",
+                   labels={'margin': 'Tỷ suất lợi nhuận', 'Country': 'Quốc gia'})
+    fig11.update_yaxes(tickformat='.1%')
+
+    fig12 = px.bar(kpis, x=kpis.index, y='avg_delivery_time', title="Thời gian giao hàng trung bình theo quốc gia",
+                   labels={'avg_delivery_time': 'Số ngày', 'Country': 'Quốc gia'})
+
+    return fig9, fig10, fig11, fig12
+
+
+def render_comparison(cache_key, selected_country, comparison, perf=NO_PERF):
+    st.subheader("So sánh quốc gia")
+    if comparison is None:
+        st.info("So sánh quốc gia cần toàn bộ dữ liệu, không khả dụng ở chế độ đọc theo luồng.")
+        return
+
+    with perf.stage('comparison/tables'):
+        kpis, segment_mix, segment_forecast = comparison()
+    default = list(dict.fromkeys([selected_country, *kpis.index[:4]]))
+    countries = st.multiselect("Chọn các quốc gia để so sánh", list(kpis.index), default=default)
+    if not countries:
+        st.info("Chọn ít nhất một quốc gia.")
+        return
+
+    table = kpis.loc[countries].rename(columns={
+        "total_orders": "Số lượng đơn hàng",
+        "total_sales": "Tổng doanh số",
+        "total_profit": "Tổng lợi nhuận",
+        "total_customers": "Số lượng khách hàng",
+        "avg_delivery_time": "Thời gian giao hàng trung bình",
+        "margin": "Tỷ suất lợi nhuận",
+    })
+    st.dataframe(table.style.format({
+        "Tổng doanh số": '{:,.2f}',
+        "Tổng lợi nhuận": '{:,.2f}',
+        "Thời gian giao hàng trung bình": '{:.2f}',
+        "Tỷ suất lợi nhuận": '{:.2%}',
+    }))
+
+    with perf.stage('comparison/figures'):
+        figures = comparison_figures(cache_key, tuple(countries), kpis, segment_mix)
+    for name, fig in zip(['fig9', 'fig10', 'fig11', 'fig12'], figures):
+        plotly_chart(perf, name, fig, use_container_width=True)
+
+    if segment_forecast is not None:
+        st.subheader(f"Dự báo doanh số {FORECAST_HORIZON} tháng tới theo phân khúc")
+        selected = segment_forecast[segment_forecast.index.get_level_values('Country').isin(countries)]
+        st.dataframe(forecast_table(selected, FORECAST_HORIZON))
+
+
+def render_section(section, cache_key, selected_country, df_cleaned, cube, average_delivery_time, large_data=False,
+                   perf=NO_PERF, comparison=None):
+    # Chỉ phần được chọn mới tính toán số liệu và dựng biểu đồ
+    if section == SECTIONS[0]:
+        render_overview(selected_country, df_cleaned, cube, average_delivery_time, perf)
+    elif section == SECTIONS[1]:
+        st.subheader(f"Trực quan hóa dữ liệu - {selected_country}")
+        granularity, metrics, window, show_yoy = render_trend_controls()
+        with perf.stage('visualization/daily_rollup', rows_in=len(df_cleaned)):
+            daily = daily_rollup(cache_key, df_cleaned)
+        with perf.stage('visualization/trend', rows_in=len(daily)):
+            fig1 = trend_figure(cache_key, granularity, metrics, window, show_yoy, large_data, daily)
+        with perf.stage('visualization/figures', rows_in=cube_size(cube)):
+            figures = visualization_figures(cache_key, selected_country, large_data, cube)
+        render_visualization(selected_country, fig1, figures, cache_key, df_cleaned, cube, perf)
+    elif section == SECTIONS[2]:
+        with perf.stage('analysis/figures', rows_in=cube_size(cube)):
+            figures = analysis_figures(cache_key, selected_country, cube)
+        render_analysis(selected_country, figures, perf)
+    elif section == SECTIONS[3]:
+        render_insights()
+    elif section == SECTIONS[4]:
+        # comparison: hàm trả về (kpis, segment_mix, segment_forecast) của mọi quốc gia, chỉ được gọi khi mở phần này
+        render_comparison(cache_key, selected_country, comparison, perf)